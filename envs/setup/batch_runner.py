@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Run a LangGraph graph over a JSONL file of inputs, many at a time.
+
+Each input line is a JSON object with an optional "id" (default: the line
+number) and either "prompt", a user message, or "input", the graph input
+itself:
+
+    {"id": "q1", "prompt": "What is LangGraph?"}
+    {"id": "q2", "input": {"messages": [{"role": "user", "content": "Hi"}]}}
+
+Lines are read as workers free up, at most --concurrency (BATCH_CONCURRENCY,
+8) graph runs are in flight, and each result is appended to the output JSONL
+as soon as it finishes, so neither inputs nor results are held in memory:
+
+    {"id": "q1", "ok": true, "output": "...", "latency_s": 1.42}
+    {"id": "q2", "ok": false, "error": "TimeoutError: ...", "latency_s": 300.0}
+
+The output file is the job's progress: a rerun skips the ids it already has
+a successful result for, so an interrupted or partly failed job resumes
+where it stopped. Provider calls stay within the per-provider limits of
+rate_limit (RATE_LIMIT_<PROVIDER>_RPM/_TPM, or --rate-limit here), however
+high the concurrency.
+
+Each attempt at an input runs on a thread id of its own (job, input id and
+a random suffix), so a checkpointed graph never resumes a failed attempt's
+state when the input is retried.
+
+Usage:
+  python3 batch_runner.py prompts.jsonl --output results.jsonl --concurrency 32 \\
+      --rate-limit openai=500:200000 --report report.json
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import time
+import uuid
+
+from api_utils import get_timeout
+from latency_window import LatencyWindow
+from rate_limit import limiter_stats
+
+DEFAULT_GRAPH = "/app/graphs/agent.py:graph"
+
+
+def load_graph(spec: str):
+    """The compiled graph named by "path/to/module.py:attribute", as langgraph.json names them."""
+    path, _, attribute = spec.rpartition(":")
+    if not path:
+        raise ValueError(f"graph '{spec}' is not path/to/module.py:attribute")
+    module_spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    if module_spec is None:
+        raise ValueError(f"cannot load a module from {path}")
+    module = importlib.util.module_from_spec(module_spec)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+    module_spec.loader.exec_module(module)
+    return getattr(module, attribute)
+
+
+def completed_ids(path: str) -> set:
+    """Ids with a successful result in an output file (empty if there is none yet)."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted run
+                continue
+            if result.get("ok"):
+                done.add(str(result["id"]))
+    return done
+
+
+def read_inputs(path: str, skip: set):
+    """(id, graph input or None, error) for each input line not in skip."""
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                record_id = str(record.get("id", number))
+                if "prompt" in record:
+                    graph_input = {"messages": [{"role": "user", "content": record["prompt"]}]}
+                else:
+                    graph_input = record["input"]
+            except (ValueError, KeyError, AttributeError) as e:
+                record_id, graph_input = str(number), None
+                error = f"line {number}: needs a JSON object with a prompt or input ({e})"
+            else:
+                error = None
+            if record_id not in skip:
+                yield record_id, graph_input, error
+
+
+def _text(message) -> str:
+    content = getattr(message, "content", message)
+    return content if isinstance(content, str) else json.dumps(content, default=str)
+
+
+class BatchRunner:
+    """
+    Runs a graph over inputs with bounded concurrency, appending results to a file.
+
+    Latencies are kept in a rolling window of BATCH_LATENCY_WINDOW (10000)
+    runs for the report.
+    """
+
+    def __init__(self, graph, output: str, concurrency: int = None, timeout: float = None,
+                 job: str = None, progress_every: float = None):
+        self.graph = graph
+        self.output = output
+        self.concurrency = concurrency or get_timeout("BATCH_CONCURRENCY", 8)
+        self.timeout = timeout or get_timeout("BATCH_TIMEOUT", 300)
+        self.job = job or os.path.splitext(os.path.basename(output))[0]
+        self.progress_every = progress_every or get_timeout("BATCH_PROGRESS_SECONDS", 10)
+        self.latencies = LatencyWindow(get_timeout("BATCH_LATENCY_WINDOW", 10000))
+        self.ok = 0
+        self.failed = 0
+        self.skipped = 0
+
+    async def invoke(self, record_id: str, graph_input) -> str:
+        """Run the graph on one input; returns the text of the last message it produced."""
+        config = {"configurable": {"thread_id": f"{self.job}-{record_id}-{uuid.uuid4().hex[:8]}"}}
+        output = None
+        async for update in self.graph.astream(graph_input, config, stream_mode="updates"):
+            for values in update.values():
+                if isinstance(values, dict) and values.get("messages"):
+                    output = _text(values["messages"][-1])
+        return output
+
+    async def _run_one(self, record_id: str, graph_input, error: str) -> dict:
+        started = time.perf_counter()
+        output = None
+        if error is None:
+            try:
+                output = await asyncio.wait_for(self.invoke(record_id, graph_input), self.timeout)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        result = {"id": record_id, "ok": error is None}
+        result.update({"output": output} if error is None else {"error": error})
+        result["latency_s"] = round(time.perf_counter() - started, 6)
+        return result
+
+    async def run(self, inputs) -> dict:
+        """Run every (id, input, error) of inputs; returns the report."""
+        started = time.perf_counter()
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        last_progress = started
+
+        async def produce():
+            # Blocking reads are short; the bounded queue keeps the file ahead of the workers only a little
+            for item in inputs:
+                await queue.put(item)
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        async def work(out):
+            nonlocal last_progress
+            while (item := await queue.get()) is not None:
+                result = await self._run_one(*item)
+                if result["ok"]:
+                    self.ok += 1
+                    self.latencies.add(result["latency_s"])
+                else:
+                    self.failed += 1
+                # One write per line: a crash leaves at most the last line cut short
+                out.write(json.dumps(result, default=str) + "\n")
+                out.flush()
+                if time.perf_counter() - last_progress >= self.progress_every:
+                    last_progress = time.perf_counter()
+                    print(format_progress(self.report(started)), flush=True)
+
+        with open(self.output, "a") as out:
+            await asyncio.gather(produce(), *(work(out) for _ in range(self.concurrency)))
+        return self.report(started)
+
+    def report(self, started: float) -> dict:
+        elapsed = time.perf_counter() - started
+        done = self.ok + self.failed
+        return {
+            "job": self.job,
+            "output": self.output,
+            "concurrency": self.concurrency,
+            "ok": self.ok,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "seconds": round(elapsed, 3),
+            "throughput_per_s": round(done / elapsed, 3) if elapsed else 0.0,
+            "latency_s": self.latencies.summary(),
+            # Time spent waiting for provider capacity, by provider
+            "rate_limits": limiter_stats(),
+        }
+
+
+def format_progress(report: dict) -> str:
+    latency = report["latency_s"]
+    p95 = f"{latency['p95']:.2f}s" if latency["p95"] is not None else "-"
+    return (f"⏳ {report['ok'] + report['failed']} done ({report['failed']} failed), "
+            f"{report['throughput_per_s']:.1f}/s, p95 {p95}")
+
+
+def format_report(report: dict) -> str:
+    latency = report["latency_s"]
+    percentiles = "  ".join(
+        f"{q} {latency[q]:.3f}s" for q in ("p50", "p95", "p99") if latency[q] is not None
+    ) or "no successful runs"
+    status = "✅" if not report["failed"] else "⚠️"
+    lines = [
+        f"{status} Batch '{report['job']}': {report['ok']} ok, {report['failed']} failed, "
+        f"{report['skipped']} already done, in {report['seconds']:.1f} s "
+        f"({report['throughput_per_s']:.1f} runs/s at concurrency {report['concurrency']})",
+        f"  latency  {percentiles}",
+    ]
+    for provider, stats in report["rate_limits"].items():
+        lines.append(f"  {provider:<9} {stats['acquired']} requests, {stats['throttled']} throttled "
+                     f"for {stats['throttle_seconds']:.1f} s, {stats['retries']} retries")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a LangGraph graph over a JSONL file of inputs.")
+    parser.add_argument("inputs", help="JSONL file of {id, prompt} or {id, input} objects")
+    parser.add_argument("--output", help="JSONL file results are appended to (default: <inputs>.results.jsonl)")
+    parser.add_argument("--graph", default=os.environ.get("BATCH_GRAPH", DEFAULT_GRAPH),
+                        help=f"path/to/module.py:graph (default: BATCH_GRAPH or {DEFAULT_GRAPH})")
+    parser.add_argument("--concurrency", type=int, help="graph runs in flight (default: BATCH_CONCURRENCY or 8)")
+    parser.add_argument("--timeout", type=float, help="seconds per run (default: BATCH_TIMEOUT or 300)")
+    parser.add_argument("--provider", help="AGENT_LLM_PROVIDER for the agent graph (a provider or auto)")
+    parser.add_argument("--rate-limit", action="append", default=[], metavar="PROVIDER=RPM[:TPM]",
+                        help="requests (and tokens) per minute for a provider; repeatable")
+    parser.add_argument("--report", metavar="FILE", help="write the JSON report to FILE")
+    args = parser.parse_args()
+
+    # Before the graph is loaded: limiters and the router read these on first use
+    for limit in args.rate_limit:
+        provider, _, rates = limit.partition("=")
+        rpm, _, tpm = rates.partition(":")
+        if not provider or not rpm.isdigit() or (tpm and not tpm.isdigit()):
+            parser.error(f"--rate-limit {limit}: expected PROVIDER=RPM[:TPM]")
+        os.environ[f"RATE_LIMIT_{provider.upper()}_RPM"] = rpm
+        if tpm:
+            os.environ[f"RATE_LIMIT_{provider.upper()}_TPM"] = tpm
+    if args.provider:
+        os.environ["AGENT_LLM_PROVIDER"] = args.provider
+
+    output = args.output or f"{os.path.splitext(args.inputs)[0]}.results.jsonl"
+    try:
+        graph = load_graph(args.graph)
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"❌ Cannot load graph {args.graph}: {e}")
+        sys.exit(1)
+    runner = BatchRunner(graph, output, args.concurrency, args.timeout,
+                         job=os.path.splitext(os.path.basename(args.inputs))[0])
+    done = completed_ids(output)
+    runner.skipped = len(done)
+    if done:
+        print(f"🔁 Resuming: {len(done)} inputs already have results in {output}")
+    started = time.perf_counter()
+    interrupted = False
+    try:
+        report = asyncio.run(runner.run(read_inputs(args.inputs, done)))
+    except KeyboardInterrupt:
+        interrupted = True
+        report = runner.report(started)
+        print(f"🛑 Interrupted; rerun the same command to resume from {output}")
+    print(format_report(report))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.report}")
+    sys.exit(130 if interrupted else 1 if report["failed"] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark the delta-encoded message list format of checkpoint_serde.
+
+A synthetic thread appends a human message and an assistant reply per turn
+and writes the messages channel after each, as the graph does at every
+step. Three formats are compared on it:
+
+  pickle    the whole list pickled at every step
+  jsonplus  the whole list through the checkpoint serializer at every step
+  delta     MessageListCodec: appended messages only, snapshot every N
+
+for bytes written over the thread and time to encode every step and to
+decode every step (as reading the thread's history does). Each decoded list
+is checked against the one that was written.
+
+Usage:
+  python3 bench_checkpoints.py --turns 200 --iterations 3 --output bench.json
+"""
+
+import argparse
+import json
+import pickle
+import random
+import string
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from checkpoint_serde import MessageListCodec
+
+
+def make_thread(turns: int, seed: int = 0) -> list:
+    """The messages list after each step of a synthetic conversation."""
+    rng = random.Random(seed)
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 9))) for _ in range(500)]
+    text = lambda n: " ".join(rng.choice(words) for _ in range(n))
+    messages, steps = [], []
+    for i in range(turns):
+        messages.append(HumanMessage(content=text(rng.randint(5, 40)), id=f"h-{i}"))
+        steps.append(list(messages))
+        messages.append(AIMessage(content=text(rng.randint(20, 200)), id=f"a-{i}"))
+        steps.append(list(messages))
+    return steps
+
+
+def _bench_full(steps: list, dumps, loads) -> dict:
+    started = time.perf_counter()
+    blobs = [dumps(value) for value in steps]
+    encoded = time.perf_counter() - started
+    started = time.perf_counter()
+    values = [loads(blob) for blob in blobs]
+    decoded = time.perf_counter() - started
+    return {"bytes": sum(len(b if isinstance(b, bytes) else b[1]) for b in blobs),
+            "encode_s": encoded, "decode_s": decoded, "same_values": values == steps}
+
+
+def _bench_delta(steps: list, serde, snapshot_every: int, compress_level: int) -> dict:
+    codec = MessageListCodec(serde, snapshot_every=snapshot_every, compress_level=compress_level)
+    started = time.perf_counter()
+    blobs = {str(i): codec.encode("thread", str(i), value) for i, value in enumerate(steps)}
+    encoded = time.perf_counter() - started
+    started = time.perf_counter()
+    values = [codec.decode(*blobs[str(i)], load_base=blobs.__getitem__, key="thread", version=str(i))
+              for i in range(len(steps))]
+    decoded = time.perf_counter() - started
+    return {"bytes": sum(len(blob) for _, blob in blobs.values()),
+            "encode_s": encoded, "decode_s": decoded, "same_values": values == steps}
+
+
+def run_benchmarks(turns: int, iterations: int, snapshot_every: int, compress_level: int) -> dict:
+    steps = make_thread(turns)
+    serde = JsonPlusSerializer()
+    formats = {
+        "pickle": lambda: _bench_full(steps, pickle.dumps, pickle.loads),
+        "jsonplus": lambda: _bench_full(steps, serde.dumps_typed, serde.loads_typed),
+        "delta": lambda: _bench_delta(steps, serde, snapshot_every, compress_level),
+    }
+    report = {"turns": turns, "steps": len(steps), "iterations": iterations,
+              "snapshot_every": snapshot_every, "compress_level": compress_level, "results": {}}
+    for name, bench in formats.items():
+        runs = [bench() for _ in range(iterations)]
+        report["results"][name] = {
+            "bytes": runs[0]["bytes"],
+            "encode_s": min(r["encode_s"] for r in runs),
+            "decode_s": min(r["decode_s"] for r in runs),
+            "same_values": all(r["same_values"] for r in runs),
+        }
+    return report
+
+
+def print_report(report: dict) -> None:
+    print(f"📊 Checkpoint format benchmark ({report['turns']} turns, {report['steps']} steps, "
+          f"best of {report['iterations']}, snapshot every {report['snapshot_every']}, "
+          f"zlib level {report['compress_level']})")
+    results = report["results"]
+    baseline = results["pickle"]
+    for name, result in results.items():
+        same = "✅ same values" if result["same_values"] else "❌ values differ"
+        print(f"  {name:<8}  {result['bytes'] / 1024:10.1f} KiB (x{baseline['bytes'] / result['bytes']:5.1f})  "
+              f"encode {result['encode_s'] * 1000:8.1f} ms  decode {result['decode_s'] * 1000:8.1f} ms  {same}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark delta-encoded checkpoints against full pickles.")
+    parser.add_argument("--turns", type=int, default=200, help="human/assistant exchanges in the thread")
+    parser.add_argument("--iterations", type=int, default=3, help="runs per format")
+    parser.add_argument("--snapshot-every", type=int, default=20, help="versions between full snapshots")
+    parser.add_argument("--compress-level", type=int, default=1, help="zlib level of the delta format, 0 = off")
+    parser.add_argument("--output", metavar="FILE", help="write the JSON report to FILE")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.turns, args.iterations, args.snapshot_every, args.compress_level)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
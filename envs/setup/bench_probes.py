@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Benchmark the api_utils probes against a local stand-in for every provider.
+
+Measures the overhead of api_utils itself (client construction, event loop
+start-up, import cost, time between requests) without real keys or network.
+The mock runs in a separate process so its work does not count towards the
+measured CPU time, and can inject latency, server errors, 429s and stalls.
+
+Each test_*_api probe and the whole test_all_apis run --iterations times;
+results (p50/p95/p99 wall time, CPU time per run) and the peak RSS of the
+whole run are printed and optionally written as JSON for comparison across
+versions.
+
+Usage:
+  python3 bench_probes.py --iterations 50 --latency-ms 20 --output bench.json
+  python3 bench_probes.py --stall-rate 1 --iterations 3   # deadline enforcement
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Dummy credentials so every probe reaches the mock
+BENCH_CREDENTIALS = {
+    "OPENAI_API_KEY": "sk-bench-0000000000000000",
+    "ANTHROPIC_API_KEY": "sk-ant-bench-000000000000",
+    "GOOGLE_API_KEY": "bench-google-0000000000",
+    "GROK_API_KEY": "xai-bench-00000000000000",
+    "GITHUB_TOKEN": "ghp_bench000000000000000",
+    "TFE_TOKEN": "bench.atlasv1.000000000000",
+    "DOCKERHUB_USERNAME": "bench",
+    "DOCKERHUB_API_KEY": "dckr_pat_bench000000000",
+    "PYPI_API_KEY": "pypi-bench-000000000000",
+}
+
+# Canned bodies, enough for the probes (and the SDKs in deep mode) to parse
+MOCK_RESPONSES = {
+    "/user": {"login": "bench"},
+    "/v1/chat/completions": {
+        "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": "bench",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": "Yes."}}],
+    },
+    "/v1/messages": {
+        "id": "msg_bench", "type": "message", "role": "assistant", "model": "bench",
+        "content": [{"type": "text", "text": "Yes."}], "stop_reason": "end_turn",
+        "usage": {"input_tokens": 1, "output_tokens": 1},
+    },
+}
+
+
+def make_mock_handler(latency_ms: float, error_rate: float, rate_limit_rate: float, stall_rate: float):
+    """Request handler answering every provider endpoint with injected faults."""
+
+    class MockProviderHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _respond(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            roll = random.random()
+            if roll < stall_rate:
+                time.sleep(3600)
+                return
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+
+            path = self.path.split("?", 1)[0]
+            status, headers = 200, {}
+            body = MOCK_RESPONSES.get(path, {"data": []})
+            if roll < stall_rate + rate_limit_rate:
+                status, headers, body = 429, {"Retry-After": "1"}, {"error": "rate limited"}
+            elif roll < stall_rate + rate_limit_rate + error_rate:
+                status, body = 500, {"error": "injected failure"}
+
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = _respond
+        do_POST = _respond
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockProviderHandler
+
+
+class MockServer(ThreadingHTTPServer):
+    """Threaded server with room for every probe connecting at once."""
+
+    daemon_threads = True
+    # The default listen backlog of 5 drops the SYNs of simultaneous probes,
+    # and their 1 s retransmit would show up as probe latency
+    request_queue_size = 64
+
+
+def _serve_mock(port_queue, latency_ms, error_rate, rate_limit_rate, stall_rate):
+    server = MockServer(("127.0.0.1", 0), make_mock_handler(latency_ms, error_rate, rate_limit_rate, stall_rate))
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+def start_mock(latency_ms=0.0, error_rate=0.0, rate_limit_rate=0.0, stall_rate=0.0):
+    """Start the mock provider in a child process; returns (process, base URL)."""
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_serve_mock, args=(port_queue, latency_ms, error_rate, rate_limit_rate, stall_rate), daemon=True
+    )
+    process.start()
+    return process, f"http://127.0.0.1:{port_queue.get(timeout=10)}"
+
+
+def percentile(samples, q: float):
+    """Nearest-rank percentile (q in 0..100)."""
+    ordered = sorted(samples)
+    rank = math.ceil(q / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def peak_rss_kb() -> int:
+    """Peak RSS of this process so far; it only ever grows, so it describes a whole run."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def measure(fn, iterations: int, warmup: int = 1) -> dict:
+    """Call fn repeatedly with stdout silenced and summarise wall and CPU time."""
+    wall, cpu, ok = [], [], 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            fn()
+        for _ in range(iterations):
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            result = fn()
+            cpu.append(time.process_time() - cpu_start)
+            wall.append(time.perf_counter() - wall_start)
+            if isinstance(result, dict):
+                ok += all(result.values())
+            else:
+                ok += bool(result)
+    return {
+        "iterations": iterations,
+        "ok": ok,
+        "wall_ms": {f"p{q}": round(percentile(wall, q) * 1000, 3) for q in (50, 95, 99)},
+        "cpu_ms": {"mean": round(sum(cpu) / len(cpu) * 1000, 3), "p95": round(percentile(cpu, 95) * 1000, 3)},
+    }
+
+
+def measure_import(runs: int = 5) -> dict:
+    """Cold import time of api_utils in fresh interpreters."""
+    code = "import time; t = time.perf_counter(); import api_utils; print(time.perf_counter() - t)"
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return {"runs": runs, "wall_ms": {f"p{q}": round(percentile(samples, q) * 1000, 3) for q in (50, 95)}}
+
+
+def run_benchmarks(args) -> dict:
+    process, base_url = start_mock(args.latency_ms, args.error_rate, args.rate_limit_rate, args.stall_rate)
+    cache_dir = tempfile.mkdtemp(prefix="bench_probes_")
+    try:
+        os.environ.update(BENCH_CREDENTIALS)
+        os.environ.update({
+            "API_PROBE_REDIRECT": base_url,
+            "API_PROBE_CACHE_PATH": os.path.join(cache_dir, "cache.json"),
+            "API_PROBE_MODE": args.mode,
+        })
+        for name in ("OPENAI_BASE_URL", "ANTHROPIC_BASE_URL"):
+            os.environ.pop(name, None)
+        for name in ("API_TIMEOUT", "GITHUB_TIMEOUT", "DOCKERHUB_TIMEOUT", "PYPI_TIMEOUT",
+                     "GROK_TIMEOUT", "TERRAFORM_TIMEOUT"):
+            os.environ[name] = str(args.timeout)
+        os.environ["API_CHECK_BUDGET"] = str(args.timeout * 2)
+
+        report = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "config": vars(args),
+            "import": measure_import(),
+        }
+        import api_utils
+
+        probes = {
+            "test_openai_api": api_utils.test_openai_api,
+            "test_gemini_api": api_utils.test_gemini_api,
+            "test_anthropic_api": api_utils.test_anthropic_api,
+            "test_grok_api": api_utils.test_grok_api,
+            "test_github_api": api_utils.test_github_api,
+            "test_Terraform_API": api_utils.test_Terraform_API,
+            "test_dockerhub_api": api_utils.test_dockerhub_api,
+            "test_pypi_api": api_utils.test_pypi_api,
+        }
+        report["probes"] = {name: measure(fn, args.iterations) for name, fn in probes.items()}
+        report["test_all_apis"] = measure(lambda: api_utils.test_all_apis(refresh=True), args.iterations)
+        report["peak_rss_kb"] = peak_rss_kb()
+        return report
+    finally:
+        process.terminate()
+
+
+def print_report(report: dict) -> None:
+    print(f"📦 import api_utils: p50 {report['import']['wall_ms']['p50']} ms")
+    print(f"{'target':<22}{'ok':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'cpu ms':>10}")
+    rows = list(report["probes"].items()) + [("test_all_apis", report["test_all_apis"])]
+    for name, stats in rows:
+        wall = stats["wall_ms"]
+        print(f"{name:<22}{stats['ok']:>3}/{stats['iterations']:<2}{wall['p50']:>10}{wall['p95']:>10}"
+              f"{wall['p99']:>10}{stats['cpu_ms']['mean']:>10}")
+    print(f"💾 peak RSS of the run: {report['peak_rss_kb']} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark api_utils probes against a local mock.")
+    parser.add_argument("--iterations", type=int, default=20, help="measured runs per target")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latency added to every mock response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of 429 responses")
+    parser.add_argument("--stall-rate", type=float, default=0.0,
+                        help="fraction of requests that never get an answer")
+    parser.add_argument("--timeout", type=int, default=2, help="per-probe timeout in seconds")
+    parser.add_argument("--mode", choices=["cheap", "deep"], default="cheap", help="LLM probe mode")
+    parser.add_argument("--output", metavar="FILE", help="write the JSON report to FILE")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark `sec_utils.py encode|decode` against the old update_secrets.sh loop.
+
+The shell version forked base64 and tr for every line (and is_b64 ran a
+second decode/encode round trip), so its cost grows with the number of
+forks; sec_utils does the whole pass in one process. Both run on the same
+generated secrets file and their outputs are checked to load to the same
+values. The generated values avoid what the shell loop got wrong: colons,
+which it mangled, and raw keys that happen to be valid base64, which it
+left unencoded (sec_utils also requires the decoded bytes to be text).
+
+Usage:
+  python3 bench_secrets.py --entries 200 --iterations 3 --output bench.json
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+import sec_utils
+
+# update_secrets.sh before it called sec_utils, with the file as $2
+LEGACY_SCRIPT = r'''
+set -euo pipefail
+MODE=$1
+SRC=$2
+TMP="$(mktemp)"
+
+is_b64() {
+  [[ $1 =~ ^([A-Za-z0-9+/]{4})*([A-Za-z0-9+/]{2}==|[A-Za-z0-9+/]{3}=)?$ ]] \
+    || return 1
+  [[ $(printf '%s' "$1" | base64 --decode 2>/dev/null | base64 | tr -d '\n') == "$1" ]]
+}
+
+encode() { printf '%s' "$1" | base64 | tr -d '\n'; }
+decode() {
+  local padded="$1"
+  while (( ${#padded} % 4 )); do padded="${padded}="; done
+  printf '%s' "$padded" | base64 --decode
+}
+
+while IFS=: read -r raw_key raw_val; do
+  indent="${raw_key%%[![:space:]]*}"
+  key="${raw_key#$indent}"
+  key="${key%"${key##*[![:space:]]}"}"
+  val="${raw_val# }"
+  val="${val%"${val##*[![:space:]]}"}"
+
+  if [[ -z $key || ${key:0:1} == "#" ]]; then
+    echo "$raw_key:$raw_val" >>"$TMP"
+    continue
+  fi
+
+  if [[ $MODE == en ]]; then
+    new_val=$(is_b64 "$val" && echo "$val" || encode "$val")
+  else
+    new_val=$(is_b64 "$val" && decode "$val" || echo "$val")
+  fi
+
+  echo "${indent}${key}: ${new_val}" >>"$TMP"
+done <"$SRC"
+
+mv "$TMP" "$SRC"
+'''
+
+
+def make_secrets(entries: int, seed: int = 0) -> str:
+    """A raw secrets file with a comment every ten entries."""
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + "-_."
+    lines = ["# Generated by bench_secrets.py"]
+    for i in range(entries):
+        if i % 10 == 0:
+            lines.append(f"# group {i // 10}")
+        value = "".join(rng.choice(alphabet) for _ in range(rng.randint(16, 64)))
+        value = f"{value[:8]}-{value[8:]}"
+        lines.append(f"SECRET_{i:05d}_API_KEY: {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _time(fn, path: str, source: str) -> float:
+    with open(path, "w") as f:
+        f.write(source)
+    started = time.perf_counter()
+    fn(path)
+    return time.perf_counter() - started
+
+
+def _load(path: str) -> dict:
+    with open(path) as f:
+        return yaml.safe_load(f)
+
+
+def run_benchmarks(entries: int, iterations: int) -> dict:
+    raw = make_secrets(entries)
+    encoded, _ = sec_utils.transform_secrets_text(raw, "encode")
+    workdir = tempfile.mkdtemp(prefix="bench_secrets_")
+    path = os.path.join(workdir, "secrets.yaml")
+    legacy = lambda mode: lambda p: subprocess.run(["bash", "-c", LEGACY_SCRIPT, "bench", mode, p], check=True)
+    native = lambda mode: lambda p: sec_utils.transform_secrets_file(p, mode)
+    report = {"entries": entries, "iterations": iterations, "results": {}}
+    try:
+        for mode, short, source in (("encode", "en", raw), ("decode", "de", encoded)):
+            outputs = {}
+            for name, fn in (("shell", legacy(short)), ("sec_utils", native(mode))):
+                times = [_time(fn, path, source) for _ in range(iterations)]
+                outputs[name] = _load(path)
+                report["results"][f"{mode}/{name}"] = {
+                    "best_s": min(times),
+                    "mean_s": sum(times) / len(times),
+                    "per_entry_us": min(times) / entries * 1e6,
+                }
+            report["results"][f"{mode}/same_output"] = outputs["shell"] == outputs["sec_utils"]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def print_report(report: dict) -> None:
+    print(f"📊 Secrets store benchmark ({report['entries']} entries, best of {report['iterations']})")
+    results = report["results"]
+    for mode in ("encode", "decode"):
+        shell, native = results[f"{mode}/shell"], results[f"{mode}/sec_utils"]
+        speedup = shell["best_s"] / native["best_s"] if native["best_s"] else float("inf")
+        same = "✅ same values" if results[f"{mode}/same_output"] else "❌ outputs differ"
+        print(f"  {mode:<6}  shell {shell['best_s'] * 1000:9.1f} ms ({shell['per_entry_us']:8.0f} µs/entry)  "
+              f"sec_utils {native['best_s'] * 1000:7.2f} ms ({native['per_entry_us']:5.1f} µs/entry)  "
+              f"x{speedup:.0f}  {same}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sec_utils encode/decode against the shell loop.")
+    parser.add_argument("--entries", type=int, default=200, help="secrets in the generated file")
+    parser.add_argument("--iterations", type=int, default=3, help="runs per implementation")
+    parser.add_argument("--output", metavar="FILE", help="write the JSON report to FILE")
+    args = parser.parse_args()
+
+    if shutil.which("bash") is None or shutil.which("base64") is None:
+        print("❌ bash and base64 are needed to run the shell version")
+        sys.exit(1)
+    report = run_benchmarks(args.entries, args.iterations)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Container bootstrap: load secrets, test API connections, then hand over.
+
+Does in one interpreter what the entrypoints used to spread over two
+(sec_utils.py writing an export file for the shell, then test_apis.py):
+secrets are loaded into this process's environment, the probes run with
+them, and then either the given command is exec'd with that environment
+(no secrets file at all) or the exports are written to --env-file once.
+
+Prints a timing breakdown of its phases at the end.
+
+Usage:
+  python3 bootstrap.py -- /bin/bash -i          # exec a command with the secrets
+  python3 bootstrap.py --env-file /tmp/env      # write exports for `source`
+  python3 bootstrap.py --skip-probes -- make run
+"""
+
+import time
+
+_started = time.perf_counter()
+
+import argparse
+import os
+import sys
+
+from sec_utils import export_secrets_to_bash, load_secrets
+from api_utils import select_probes, test_all_apis
+from test_apis import provider_list
+
+
+class PhaseTimer:
+    """Wall-clock duration of each bootstrap phase, in order."""
+
+    def __init__(self, started: float = None):
+        self.started = time.perf_counter() if started is None else started
+        self.phases = {}
+        self._mark = self.started
+
+    def done(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.phases[phase] = now - self._mark
+        self._mark = now
+
+    def report(self) -> str:
+        parts = [f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.phases.items()]
+        total = (self._mark - self.started) * 1000
+        return f"⏱️  Bootstrap phases: {', '.join(parts)} (total {total:.0f} ms)"
+
+
+def main():
+    timer = PhaseTimer(_started)
+    timer.done("import")
+
+    parser = argparse.ArgumentParser(description="Load secrets, test APIs and start a command.")
+    parser.add_argument("--env-file", metavar="FILE",
+                        help="write the loaded secrets as bash exports to FILE")
+    parser.add_argument("--skip-probes", action="store_true", help="do not test API connections")
+    parser.add_argument("--refresh", action="store_true",
+                        help="ignore cached probe results and re-probe every provider")
+    parser.add_argument("--only", type=provider_list, action="extend", metavar="PROVIDERS",
+                        help="probe only these providers (comma-separated)")
+    parser.add_argument("--skip", type=provider_list, action="extend", metavar="PROVIDERS",
+                        help="do not probe these providers (comma-separated)")
+    parser.add_argument("command", nargs=argparse.REMAINDER,
+                        help="command to exec once done (after --)")
+    args = parser.parse_args()
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+
+    try:
+        probes = select_probes(args.only, args.skip)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print("🔐 Loading secrets...")
+    load_secrets()
+    timer.done("secrets")
+
+    if not args.skip_probes:
+        print("🧪 Testing API connections...")
+        try:
+            test_all_apis(refresh=args.refresh, probes=probes)
+        except Exception as e:
+            # Don't fail the container start because a provider is unreachable
+            print(f"❌ Error testing APIs: {e}")
+        timer.done("probes")
+
+    if args.env_file:
+        export_secrets_to_bash(args.env_file)
+        timer.done("env_file")
+
+    print(timer.report())
+    if command:
+        print(f"└─ Bootstrap finished; starting {' '.join(command)} ───────")
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.execvp(command[0], command)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Token streaming from the provider chat APIs.
+
+stream_chat() yields the text of a reply chunk by chunk as the provider
+generates it, from the pooled async clients of client_pool and within the
+provider's rate_limit budget. OpenAI, Grok and Gemini are reached through
+the OpenAI chat completions API, Anthropic through its messages API.
+
+The "fake" provider needs no key or network: it streams the old echo reply
+word by word, waiting AGENT_FAKE_FIRST_TOKEN_MS (200) before the first word
+and AGENT_FAKE_TOKEN_MS (20) between words, to exercise the streaming path
+offline.
+
+Usage:
+    from chat_stream import stream_chat
+    async for text in stream_chat("openai", [{"role": "user", "content": "Hi"}]):
+        print(text, end="", flush=True)
+"""
+
+import asyncio
+import os
+
+from api_utils import MODEL_ALIASES, get_timeout
+from client_pool import PROVIDERS, get_pool
+from rate_limit import RetryScheduler, get_limiter
+
+FAKE_PROVIDER = "fake"
+
+# Message types as LangChain names them -> roles as the provider APIs do
+ROLES = {"human": "user", "ai": "assistant", "system": "system"}
+
+
+def chat_messages(messages: list) -> list:
+    """LangChain messages as provider chat messages."""
+    return [{"role": ROLES.get(m.type, "user"), "content": m.content} for m in messages]
+
+
+def stream_providers() -> list:
+    """Providers stream_chat() accepts."""
+    return [*PROVIDERS, FAKE_PROVIDER]
+
+
+async def fake_stream(chat: list):
+    """Stream the echo reply without any provider."""
+    last = chat[-1]["content"] if chat else ""
+    words = f"Hello! You said: {last}".split(" ")
+    await asyncio.sleep(get_timeout("AGENT_FAKE_FIRST_TOKEN_MS", 200) / 1000)
+    for i, word in enumerate(words):
+        if i:
+            await asyncio.sleep(get_timeout("AGENT_FAKE_TOKEN_MS", 20) / 1000)
+        yield word if i == 0 else f" {word}"
+
+
+async def stream_chat(provider: str, chat: list, model: str = None, max_tokens: int = None):
+    """
+    Yield the reply to chat (a list of role/content dicts) as text chunks.
+
+    The request is retried on 429s and 5xx until the first chunk arrives;
+    once text has been yielded an error is raised to the caller instead.
+    The model defaults to <PROVIDER>_MODEL, then the first MODEL_ALIASES entry.
+    """
+    if provider == FAKE_PROVIDER:
+        async for text in fake_stream(chat):
+            yield text
+        return
+
+    # The scheduler owns retries, so the SDK must not add its own
+    client = get_pool().get_async_client(provider).with_options(
+        max_retries=0, timeout=get_timeout("AGENT_LLM_TIMEOUT", 60)
+    )
+    scheduler = RetryScheduler(get_limiter(provider))
+    model = model or os.environ.get(f"{provider.upper()}_MODEL") or MODEL_ALIASES[provider][0]
+    max_tokens = max_tokens or get_timeout("AGENT_MAX_TOKENS", 512)
+
+    if provider == "anthropic":
+        system = "\n".join(m["content"] for m in chat if m["role"] == "system")
+        stream = await scheduler.acall(
+            client.messages.create,
+            model=model,
+            max_tokens=max_tokens,
+            messages=[m for m in chat if m["role"] != "system"],
+            stream=True,
+            tokens=max_tokens,
+            **({"system": system} if system else {}),
+        )
+        async with stream:
+            async for event in stream:
+                if event.type == "content_block_delta" and event.delta.type == "text_delta":
+                    yield event.delta.text
+        return
+
+    # OpenAI, Grok and Gemini share the chat completions API
+    stream = await scheduler.acall(
+        client.chat.completions.create,
+        model=model,
+        messages=chat,
+        max_tokens=max_tokens,
+        stream=True,
+        tokens=max_tokens,
+    )
+    async with stream:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
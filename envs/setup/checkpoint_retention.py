@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Retention and compaction of the checkpoints SQLCheckpointSaver stores.
+
+Nothing else removes checkpoints, so every step of every thread is kept
+forever. CheckpointRetention applies a retention policy to a saver's
+database:
+
+- the latest CHECKPOINT_KEEP_LATEST (20) checkpoints of each thread (and
+  subgraph namespace) are kept;
+- older ones are thinned to the newest per CHECKPOINT_KEEP_BUCKET (3600)
+  seconds, 0 to drop them all;
+- threads with no checkpoint for CHECKPOINT_THREAD_TTL (30 days) seconds
+  are removed entirely, 0 to never expire them.
+
+Channel blobs no kept checkpoint points to are removed with the writes of
+the removed checkpoints. A kept checkpoint whose parent was removed is
+pointed at its nearest kept ancestor, so history stays walkable. Message
+lists written as deltas (checkpoint_serde) are compacted first: a kept delta
+whose base version is going away is rewritten as a snapshot. A live saver,
+here or in another process, that last wrote a removed version checks for it
+before writing a delta on it, and writes a snapshot instead.
+
+Rows are deleted by primary key, CHECKPOINT_RETENTION_BATCH (500) per
+transaction with CHECKPOINT_RETENTION_PAUSE_MS (10) between transactions, so
+live traffic is never locked out for long. SQLite databases created by the
+saver hand freed pages back to the file after each batch (incremental
+vacuum); Postgres reuses them through autovacuum.
+
+Run it once from the command line, or every CHECKPOINT_RETENTION_INTERVAL
+(3600) seconds in the background:
+
+    python3 checkpoint_retention.py sqlite:////data/checkpoints.db --dry-run
+    start_retention(saver)
+
+Each run reports what it deleted, the bytes reclaimed and how long it took.
+"""
+
+import argparse
+import collections
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+from api_utils import get_timeout
+from checkpoint_serde import MESSAGES_TYPE
+
+# Bytes of a blob that hold a delta's header and base version
+_HEADER_BYTES = 128
+
+
+def _size(value) -> int:
+    return int(value or 0)
+
+
+class CheckpointRetention:
+    """Applies the retention policy to the database of a SQLCheckpointSaver."""
+
+    def __init__(self, saver, keep_latest: int = None, bucket: int = None, ttl: int = None,
+                 batch_size: int = None, pause_ms: int = None):
+        self.saver = saver
+        self.backend = saver.backend
+        self.keep_latest = get_timeout("CHECKPOINT_KEEP_LATEST", 20) if keep_latest is None else keep_latest
+        self.bucket = get_timeout("CHECKPOINT_KEEP_BUCKET", 3600) if bucket is None else bucket
+        self.ttl = get_timeout("CHECKPOINT_THREAD_TTL", 30 * 86400) if ttl is None else ttl
+        self.batch_size = batch_size or get_timeout("CHECKPOINT_RETENTION_BATCH", 500)
+        self.pause = (get_timeout("CHECKPOINT_RETENTION_PAUSE_MS", 10) if pause_ms is None else pause_ms) / 1000
+
+    # -- database helpers ---------------------------------------------------
+
+    def _query(self, statement: str, params: list) -> list:
+        with self.backend.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.backend.sql(statement), params)
+            return cursor.fetchall()
+
+    def _execute(self, statement: str, rows: list, report: dict) -> None:
+        """Run statement for each row, batch_size rows per transaction."""
+        for start in range(0, len(rows), self.batch_size):
+            with self.backend.connection() as conn:
+                conn.cursor().executemany(self.backend.sql(statement), rows[start:start + self.batch_size])
+                self._reclaim(conn)
+            report["batches"] += 1
+            if self.pause:
+                time.sleep(self.pause)
+
+    def _reclaim(self, conn) -> None:
+        # SQLite keeps freed pages unless the file was created with auto_vacuum=INCREMENTAL
+        if self.backend.blob_type == "BLOB" and conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            # executescript commits the batch first, then frees every page, not one per step
+            conn.executescript("PRAGMA incremental_vacuum")
+
+    # -- policy -------------------------------------------------------------
+
+    def keep(self, checkpoints: list) -> set:
+        """Ids to keep among (checkpoint_id, created_at) pairs, newest first."""
+        kept = {checkpoint_id for checkpoint_id, _ in checkpoints[:self.keep_latest]}
+        if self.bucket:
+            buckets = set()
+            for checkpoint_id, created_at in checkpoints[self.keep_latest:]:
+                bucket = int(created_at // self.bucket)
+                if bucket not in buckets:
+                    buckets.add(bucket)
+                    kept.add(checkpoint_id)
+        return kept
+
+    # -- run ----------------------------------------------------------------
+
+    def run(self, dry_run: bool = False, now: float = None) -> dict:
+        """Apply the policy to every thread; returns the report."""
+        started = time.perf_counter()
+        now = time.time() if now is None else now
+        report = {
+            "dry_run": dry_run,
+            "threads": 0,
+            "threads_expired": 0,
+            "checkpoints_deleted": 0,
+            "blobs_deleted": 0,
+            "writes_deleted": 0,
+            "blobs_compacted": 0,
+            "bytes_reclaimed": 0,
+            "batches": 0,
+        }
+        # Queued checkpoints first, so what is live is in the database
+        self.saver.flush()
+        threads = collections.defaultdict(list)
+        for thread_id, checkpoint_ns, latest in self._query(
+            "SELECT thread_id, checkpoint_ns, MAX(created_at) FROM checkpoints GROUP BY thread_id, checkpoint_ns", []
+        ):
+            threads[thread_id].append((checkpoint_ns, latest))
+        for thread_id, namespaces in threads.items():
+            report["threads"] += 1
+            if self.ttl and max(latest for _, latest in namespaces) < now - self.ttl:
+                self._expire(thread_id, report, dry_run)
+                continue
+            for checkpoint_ns, _ in namespaces:
+                self._thin(thread_id, checkpoint_ns, report, dry_run)
+        report["seconds"] = round(time.perf_counter() - started, 6)
+        return report
+
+    def _expire(self, thread_id: str, report: dict, dry_run: bool) -> None:
+        """Delete every row of an idle thread."""
+        report["threads_expired"] += 1
+        # table, report counter, primary key after thread_id, bytes of a row
+        tables = [
+            ("checkpoints", "checkpoints_deleted", "checkpoint_ns, checkpoint_id",
+             "COALESCE(LENGTH(checkpoint), 0) + COALESCE(LENGTH(metadata), 0)"),
+            ("checkpoint_blobs", "blobs_deleted", "checkpoint_ns, channel, version", "COALESCE(LENGTH(blob), 0)"),
+            ("checkpoint_writes", "writes_deleted", "checkpoint_ns, checkpoint_id, task_id, idx",
+             "COALESCE(LENGTH(blob), 0)"),
+        ]
+        for table, counter, columns, size in tables:
+            rows = self._query(f"SELECT {columns}, {size} FROM {table} WHERE thread_id = ?", [thread_id])
+            report[counter] += len(rows)
+            report["bytes_reclaimed"] += sum(_size(row[-1]) for row in rows)
+            if not dry_run:
+                conditions = " AND ".join(f"{column} = ?" for column in columns.split(", "))
+                self._execute(f"DELETE FROM {table} WHERE thread_id = ? AND {conditions}",
+                              [(thread_id, *row[:-1]) for row in rows], report)
+        if not dry_run:
+            self.saver.codec.forget(lambda key: key[0] == thread_id)
+
+    def _thin(self, thread_id: str, checkpoint_ns: str, report: dict, dry_run: bool) -> None:
+        """Apply keep() to one namespace of a thread, with its blobs and writes."""
+        scope = "thread_id = ? AND checkpoint_ns = ?"
+        # Blobs before checkpoints: a blob and its checkpoint are committed
+        # together, so every blob listed here has its checkpoint listed below
+        blobs = self._query(
+            "SELECT channel, version, type, COALESCE(LENGTH(blob), 0),"
+            f" CASE WHEN type = ? THEN SUBSTR(blob, 1, {_HEADER_BYTES}) END"
+            f" FROM checkpoint_blobs WHERE {scope}", [MESSAGES_TYPE, thread_id, checkpoint_ns])
+        checkpoints = self._query(
+            "SELECT checkpoint_id, parent_checkpoint_id, created_at,"
+            " COALESCE(LENGTH(checkpoint), 0) + COALESCE(LENGTH(metadata), 0)"
+            f" FROM checkpoints WHERE {scope} ORDER BY checkpoint_id DESC", [thread_id, checkpoint_ns])
+        kept = self.keep([(checkpoint_id, created_at) for checkpoint_id, _, created_at, _ in checkpoints])
+
+        referenced = set()
+        kept_ids = [checkpoint_id for checkpoint_id, *_ in checkpoints if checkpoint_id in kept]
+        for start in range(0, len(kept_ids), self.batch_size):
+            chunk = kept_ids[start:start + self.batch_size]
+            for type_, blob in self._query(
+                f"SELECT type, checkpoint FROM checkpoints WHERE {scope}"
+                f" AND checkpoint_id IN ({', '.join('?' * len(chunk))})", [thread_id, checkpoint_ns, *chunk]
+            ):
+                versions = self.saver.serde.loads_typed((type_, bytes(blob))).get("channel_versions", {})
+                referenced.update((channel, str(version)) for channel, version in versions.items())
+
+        # Kept deltas built on a version that is going away become snapshots
+        compact = []
+        for channel, version, type_, _, header in blobs:
+            if (channel, version) in referenced and header is not None:
+                base = self.saver.codec.base_version(bytes(header))
+                if base is not None and (channel, base) not in referenced:
+                    compact.append((channel, version, type_))
+        report["blobs_compacted"] += len(compact)
+        if compact and not dry_run:
+            self._compact(thread_id, checkpoint_ns, compact, report)
+
+        doomed = [row for row in checkpoints if row[0] not in kept]
+        unreferenced = [row for row in blobs if (row[0], row[1]) not in referenced]
+        doomed_ids = {row[0] for row in doomed}
+        writes = [row for row in self._query(
+            f"SELECT checkpoint_id, task_id, idx, COALESCE(LENGTH(blob), 0) FROM checkpoint_writes WHERE {scope}",
+            [thread_id, checkpoint_ns]) if row[0] in doomed_ids] if doomed_ids else []
+        report["checkpoints_deleted"] += len(doomed)
+        report["blobs_deleted"] += len(unreferenced)
+        report["writes_deleted"] += len(writes)
+        report["bytes_reclaimed"] += sum(_size(row[3]) for row in itertools.chain(doomed, unreferenced, writes))
+        if dry_run or not (doomed or unreferenced):
+            return
+
+        # Re-parent before deleting, so no kept checkpoint ever points at a missing one
+        parents = {checkpoint_id: parent for checkpoint_id, parent, *_ in checkpoints}
+        reparent = []
+        for checkpoint_id in kept_ids:
+            parent = parents.get(checkpoint_id)
+            if parent not in doomed_ids:
+                continue
+            while parent is not None and parent not in kept:
+                parent = parents.get(parent)
+            reparent.append((parent, thread_id, checkpoint_ns, checkpoint_id))
+        self._execute(f"UPDATE checkpoints SET parent_checkpoint_id = ? WHERE {scope} AND checkpoint_id = ?",
+                      reparent, report)
+        self._execute(f"DELETE FROM checkpoints WHERE {scope} AND checkpoint_id = ?",
+                      [(thread_id, checkpoint_ns, row[0]) for row in doomed], report)
+        self._execute(f"DELETE FROM checkpoint_writes WHERE {scope} AND checkpoint_id = ? AND task_id = ? AND idx = ?",
+                      [(thread_id, checkpoint_ns, *row[:3]) for row in writes], report)
+        self._execute(f"DELETE FROM checkpoint_blobs WHERE {scope} AND channel = ? AND version = ?",
+                      [(thread_id, checkpoint_ns, *row[:2]) for row in unreferenced], report)
+
+    def _compact(self, thread_id: str, checkpoint_ns: str, compact: list, report: dict) -> None:
+        """Rewrite delta blobs as snapshots, in place."""
+        updates = []
+        for channel, version, type_ in compact:
+            with self.backend.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(self.backend.sql(
+                    "SELECT blob FROM checkpoint_blobs"
+                    " WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?"
+                ), [thread_id, checkpoint_ns, channel, version])
+                blob = bytes(cursor.fetchone()[0])
+                value = self.saver._decode(cursor, thread_id, checkpoint_ns, channel, version, type_, blob)
+            _, snapshot = self.saver.codec.snapshot(value)
+            # Snapshots are larger than the deltas they replace
+            report["bytes_reclaimed"] -= len(snapshot) - len(blob)
+            updates.append((snapshot, thread_id, checkpoint_ns, channel, version))
+        self._execute("UPDATE checkpoint_blobs SET blob = ?"
+                      " WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?", updates, report)
+
+
+def format_report(report: dict) -> str:
+    action = "would reclaim" if report["dry_run"] else "reclaimed"
+    return (
+        f"🧹 Checkpoint retention: {report['threads']} threads ({report['threads_expired']} expired), "
+        f"{report['checkpoints_deleted']} checkpoints, {report['blobs_deleted']} blobs and "
+        f"{report['writes_deleted']} writes deleted, {report['blobs_compacted']} blobs compacted; "
+        f"{action} {report['bytes_reclaimed'] / 1024:.1f} KiB in {report['seconds']:.3f} s"
+    )
+
+
+class RetentionTask:
+    """Background thread running a CheckpointRetention every interval seconds."""
+
+    def __init__(self, retention: CheckpointRetention, interval: float = None):
+        self.retention = retention
+        self.interval = interval or get_timeout("CHECKPOINT_RETENTION_INTERVAL", 3600)
+        self.last_report = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> "RetentionTask":
+        self._thread = threading.Thread(target=self._run, name="checkpoint-retention", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_report = self.retention.run()
+                print(format_report(self.last_report))
+            except Exception as e:
+                print(f"❌ Checkpoint retention failed: {e}")
+
+
+def start_retention(saver, interval: float = None, **policy) -> RetentionTask:
+    """Run retention on saver's database every interval seconds, in a daemon thread."""
+    return RetentionTask(CheckpointRetention(saver, **policy), interval).start()
+
+
+def main():
+    # Imported here: the saver starts a writer thread, which only the CLI needs
+    from checkpointer import saver_from_url
+
+    parser = argparse.ArgumentParser(description="Thin old checkpoints and expire idle threads.")
+    parser.add_argument("url", nargs="?", default=os.environ.get("AGENT_CHECKPOINT_URL"),
+                        help="postgresql:// or sqlite:// URL (default: AGENT_CHECKPOINT_URL)")
+    parser.add_argument("--keep", type=int, help="latest checkpoints kept per thread")
+    parser.add_argument("--bucket", type=int, help="seconds per bucket older checkpoints are thinned to, 0 = none")
+    parser.add_argument("--ttl", type=int, help="seconds a thread may stay idle, 0 = forever")
+    parser.add_argument("--batch", type=int, help="rows per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="report without deleting")
+    parser.add_argument("--output", metavar="FILE", help="write the JSON report to FILE")
+    args = parser.parse_args()
+    if not args.url:
+        print("❌ No checkpoint database: pass a URL or set AGENT_CHECKPOINT_URL")
+        sys.exit(1)
+
+    with saver_from_url(args.url) as saver:
+        retention = CheckpointRetention(saver, keep_latest=args.keep, bucket=args.bucket, ttl=args.ttl,
+                                        batch_size=args.batch)
+        report = retention.run(dry_run=args.dry_run)
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+Delta encoding of append-only message lists in checkpoints.
+
+add_messages only ever appends to State["messages"], yet every checkpoint
+stores the whole list, so bytes written and serialization time grow
+quadratically over a conversation. MessageListCodec writes only the messages
+appended since the channel's previous version, plus a full snapshot every
+CHECKPOINT_SNAPSHOT_EVERY (20) versions so a read never follows more than
+that many deltas.
+
+Messages are encoded compactly: plain human/ai/system messages (string
+content, no tool calls or metadata but message_window's token count) as
+[kind, id, content(, token count)], anything else through the checkpoint
+serializer, all packed with msgpack and optionally zlib-compressed
+(CHECKPOINT_COMPRESS_LEVEL, 0 = off, default 1).
+
+A delta is only written when the new list starts with the previous one
+(same objects or equal messages); otherwise, and after a restart, the codec
+falls back to a snapshot. Before a delta against a version written more than
+CHECKPOINT_VERIFY_BASE_SECONDS (60) ago, the writer is asked whether that
+version still exists, as retention may have removed it since; if not, a
+snapshot is written. Values that are not message lists use the serializer
+unchanged.
+
+Blob layout (type "messages"):
+    b"MD" | version | flags (1: zlib, 2: delta)
+    [delta: base length (uint32) | base version length (uint16) | base version]
+    payload
+"""
+
+import collections
+import struct
+import threading
+import time
+import zlib
+
+import ormsgpack
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from api_utils import get_timeout
+
+MESSAGES_TYPE = "messages"
+_MAGIC = b"MD"
+_FORMAT = 1
+_ZLIB = 1
+_DELTA = 2
+_HEADER = struct.Struct(">2sBB")
+_BASE = struct.Struct(">IH")
+
+# Kind codes of the compact form; 0 is "through the serializer"
+_KINDS = {HumanMessage: 1, AIMessage: 2, SystemMessage: 3}
+_CLASSES = {code: cls for cls, code in _KINDS.items()}
+# response_metadata key of message_window's token counts
+_TOKEN_COUNT = "token_count"
+
+
+def _is_plain(message: BaseMessage) -> bool:
+    """Whether [kind, id, content(, token count)] holds everything the message has."""
+    return (
+        type(message) in _KINDS
+        and isinstance(message.content, str)
+        and not message.additional_kwargs
+        and (not message.response_metadata or message.response_metadata.keys() == {_TOKEN_COUNT})
+        and message.name is None
+        and not getattr(message, "tool_calls", None)
+        and not getattr(message, "invalid_tool_calls", None)
+        and getattr(message, "usage_metadata", None) is None
+        and not getattr(message, "example", False)
+    )
+
+
+class _Head:
+    """What was last written for one channel of one thread."""
+    __slots__ = ("version", "items", "depth", "written_at")
+
+    def __init__(self, version: str, items: list, depth: int):
+        self.version = version
+        self.items = items
+        self.depth = depth
+        self.written_at = time.monotonic()
+
+
+class MessageListCodec:
+    """
+    Encodes channel values as deltas against the previous version of the channel.
+
+    Keys identify a channel of a thread (e.g. (thread_id, checkpoint_ns,
+    channel)); the last CHECKPOINT_DELTA_HEADS (1024) keys written, and as
+    many decoded versions, are remembered so that reading a thread's
+    checkpoints one after the other does not decode its snapshot each time.
+    Thread-safe.
+    """
+
+    def __init__(self, serde, snapshot_every: int = None, compress_level: int = None, max_heads: int = None,
+                 verify_after: float = None):
+        self.serde = serde
+        self.verify_after = get_timeout("CHECKPOINT_VERIFY_BASE_SECONDS", 60) if verify_after is None else verify_after
+        self.snapshot_every = snapshot_every or get_timeout("CHECKPOINT_SNAPSHOT_EVERY", 20)
+        self.compress_level = get_timeout("CHECKPOINT_COMPRESS_LEVEL", 1) if compress_level is None else compress_level
+        self.max_heads = max_heads or get_timeout("CHECKPOINT_DELTA_HEADS", 1024)
+        self._heads = collections.OrderedDict()
+        self._decoded = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    # -- messages <-> payload -----------------------------------------------
+
+    def _pack(self, messages: list) -> bytes:
+        items = []
+        for message in messages:
+            if _is_plain(message):
+                item = [_KINDS[type(message)], message.id, message.content]
+                if message.response_metadata:
+                    item.append(message.response_metadata[_TOKEN_COUNT])
+                items.append(item)
+            else:
+                items.append([0, *self.serde.dumps_typed(message)])
+        payload = ormsgpack.packb(items)
+        return zlib.compress(payload, self.compress_level) if self.compress_level else payload
+
+    def _unpack(self, payload: bytes, compressed: bool) -> list:
+        if compressed:
+            payload = zlib.decompress(payload)
+        messages = []
+        for item in ormsgpack.unpackb(payload):
+            if not item[0]:
+                messages.append(self.serde.loads_typed((item[1], item[2])))
+            elif len(item) > 3:
+                messages.append(_CLASSES[item[0]](content=item[2], id=item[1],
+                                                  response_metadata={_TOKEN_COUNT: item[3]}))
+            else:
+                messages.append(_CLASSES[item[0]](content=item[2], id=item[1]))
+        return messages
+
+    # -- encode / decode ----------------------------------------------------
+
+    def encode(self, key, version, value, base_exists=None) -> tuple:
+        """
+        (type, blob) for a channel value, a delta against the key's previous version where possible.
+
+        base_exists(version), if given, is asked before a delta against a
+        version older than verify_after seconds; False forces a snapshot.
+        """
+        if not isinstance(value, list) or not all(isinstance(m, BaseMessage) for m in value):
+            with self._lock:
+                self._heads.pop(key, None)
+            return self.serde.dumps_typed(value)
+
+        with self._lock:
+            head = self._heads.get(key)
+        flags = _ZLIB if self.compress_level else 0
+        base = b""
+        appended = value
+        depth = 0
+        if (
+            head is not None
+            and head.items
+            and head.depth + 1 < self.snapshot_every
+            and len(value) >= len(head.items)
+            and all(a is b or a == b for a, b in zip(head.items, value))
+            and (
+                base_exists is None
+                or time.monotonic() - head.written_at < self.verify_after
+                or base_exists(head.version)
+            )
+        ):
+            flags |= _DELTA
+            version_bytes = str(head.version).encode("utf-8")
+            base = _BASE.pack(len(head.items), len(version_bytes)) + version_bytes
+            appended = value[len(head.items):]
+            depth = head.depth + 1
+
+        blob = _HEADER.pack(_MAGIC, _FORMAT, flags) + base + self._pack(appended)
+        with self._lock:
+            self._heads[key] = _Head(str(version), list(value), depth)
+            self._heads.move_to_end(key)
+            while len(self._heads) > self.max_heads:
+                self._heads.popitem(last=False)
+        return MESSAGES_TYPE, blob
+
+    def snapshot(self, value: list) -> tuple:
+        """(type, blob) of a message list as a full snapshot, leaving the heads alone."""
+        flags = _ZLIB if self.compress_level else 0
+        return MESSAGES_TYPE, _HEADER.pack(_MAGIC, _FORMAT, flags) + self._pack(value)
+
+    @staticmethod
+    def base_version(blob: bytes):
+        """Version a delta blob builds on, or None for a snapshot."""
+        _, _, flags = _HEADER.unpack_from(blob)
+        if not flags & _DELTA:
+            return None
+        _, size = _BASE.unpack_from(blob, _HEADER.size)
+        start = _HEADER.size + _BASE.size
+        return bytes(blob[start:start + size]).decode("utf-8")
+
+    def decode(self, type_: str, blob: bytes, load_base=None, key=None, version=None):
+        """
+        Value of a blob written by encode().
+
+        load_base(version) must return the (type, blob) of the same channel
+        at that version; it is called for deltas only. Passing the blob's key
+        and version lets later deltas reuse the decoded list.
+        """
+        if type_ != MESSAGES_TYPE:
+            return self.serde.loads_typed((type_, blob))
+        magic, fmt, flags = _HEADER.unpack_from(blob)
+        if magic != _MAGIC or fmt != _FORMAT:
+            raise ValueError(f"unknown message list format {magic!r} v{fmt}")
+        offset = _HEADER.size
+        prefix = []
+        if flags & _DELTA:
+            base_length, size = _BASE.unpack_from(blob, offset)
+            offset += _BASE.size
+            base_version = bytes(blob[offset:offset + size]).decode("utf-8")
+            offset += size
+            with self._lock:
+                prefix = self._decoded.get((key, base_version)) if key is not None else None
+            if prefix is None:
+                prefix = self.decode(*load_base(base_version), load_base=load_base, key=key, version=base_version)
+            prefix = prefix[:base_length]
+        value = prefix + self._unpack(bytes(blob[offset:]), bool(flags & _ZLIB))
+        if key is not None and version is not None:
+            with self._lock:
+                self._decoded[(key, str(version))] = value
+                self._decoded.move_to_end((key, str(version)))
+                while len(self._decoded) > self.max_heads:
+                    self._decoded.popitem(last=False)
+            return list(value)
+        return value
+
+    def forget(self, match) -> None:
+        """Drop the remembered heads and decoded versions whose key satisfies match(key)."""
+        with self._lock:
+            for key in [key for key in self._heads if match(key)]:
+                del self._heads[key]
+            for cached in [cached for cached in self._decoded if match(cached[0])]:
+                del self._decoded[cached]
@@ -0,0 +1,186 @@
+"""
+Process-wide pool of provider clients shared by the API probes and the graph nodes.
+
+Every SDK client handed out here is built on one pooled httpx client, so
+connections opened by one caller (a probe, say) stay alive and are reused by
+the next (a graph node) instead of every client bringing its own pool:
+
+- sync clients share one httpx.Client, which is thread-safe;
+- async clients share one httpx.AsyncClient per event loop, since asyncio
+  connections cannot move between loops;
+- SDK clients are cached per provider and rebuilt when the credential or
+  base URL changes, so a rotated key takes effect on the next call.
+
+Pool limits come from API_MAX_CONNECTIONS (20), API_MAX_KEEPALIVE_CONNECTIONS
+(same as API_MAX_CONNECTIONS) and API_KEEPALIVE_EXPIRY (30 seconds).
+
+Usage:
+    from client_pool import get_pool
+    client = get_pool().get_async_client("openai")
+    response = await client.chat.completions.create(...)
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+from typing import NamedTuple
+
+import httpx
+
+from api_utils import get_timeout, load_sdk
+
+
+class ProviderSpec(NamedTuple):
+    """How to build a provider's SDK client."""
+    sdk: str                        # load_sdk key of the SDK package
+    sync_class: str
+    async_class: str
+    key_env: str                    # env var holding the API key
+    base_url_env: str = None        # env var overriding the base URL
+    default_base_url: str = None    # None: the SDK's own default
+
+
+PROVIDERS = {
+    "openai": ProviderSpec("openai", "OpenAI", "AsyncOpenAI", "OPENAI_API_KEY", "OPENAI_BASE_URL"),
+    "anthropic": ProviderSpec("anthropic", "Anthropic", "AsyncAnthropic", "ANTHROPIC_API_KEY", "ANTHROPIC_BASE_URL"),
+    # Grok and Gemini serve the OpenAI API
+    "grok": ProviderSpec("openai", "OpenAI", "AsyncOpenAI", "GROK_API_KEY", "GROK_BASE_URL", "https://api.x.ai/v1"),
+    "gemini": ProviderSpec("openai", "OpenAI", "AsyncOpenAI", "GOOGLE_API_KEY", "GEMINI_BASE_URL",
+                           "https://generativelanguage.googleapis.com/v1beta/openai/"),
+}
+
+
+def _credential_key(api_key: str, base_url: str) -> str:
+    return hashlib.sha256(f"{api_key}\0{base_url or ''}".encode("utf-8")).hexdigest()
+
+
+class ClientPool:
+    """
+    Hands out one pooled client per provider and credential.
+
+    Safe to share between threads and asyncio tasks: lookups and rebuilds
+    happen under a lock, and replacing a client never closes the shared
+    connection pool, so requests in flight on the old client finish normally.
+    """
+
+    def __init__(self, max_connections: int = None, max_keepalive: int = None,
+                 keepalive_expiry: float = None):
+        max_connections = max_connections or get_timeout("API_MAX_CONNECTIONS", 20)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive or get_timeout("API_MAX_KEEPALIVE_CONNECTIONS", max_connections),
+            keepalive_expiry=keepalive_expiry or get_timeout("API_KEEPALIVE_EXPIRY", 30),
+        )
+        self._lock = threading.RLock()
+        self._sync_http = None
+        self._sync_clients = {}     # provider -> (credential key, client)
+        self._async_http = {}       # event loop -> httpx.AsyncClient
+        self._async_clients = {}    # event loop -> {provider: (credential key, client)}
+
+    def http_client(self) -> httpx.Client:
+        """The shared synchronous HTTP client."""
+        with self._lock:
+            if self._sync_http is None or self._sync_http.is_closed:
+                self._sync_http = httpx.Client(limits=self.limits)
+            return self._sync_http
+
+    def async_http_client(self) -> httpx.AsyncClient:
+        """The shared asynchronous HTTP client of the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._forget_closed_loops()
+            client = self._async_http.get(loop)
+            if client is None or client.is_closed:
+                client = self._async_http[loop] = httpx.AsyncClient(limits=self.limits)
+                self._async_clients[loop] = {}
+            return client
+
+    def _forget_closed_loops(self) -> None:
+        # Connections of a finished loop are unusable; drop them with it
+        for loop in [loop for loop in self._async_http if loop.is_closed()]:
+            del self._async_http[loop]
+            self._async_clients.pop(loop, None)
+
+    def _settings(self, provider: str, api_key: str = None, base_url: str = None):
+        spec = PROVIDERS.get(provider)
+        if spec is None:
+            raise ValueError(f"unknown provider '{provider}'; choose from {', '.join(PROVIDERS)}")
+        api_key = api_key or os.environ.get(spec.key_env)
+        if not api_key:
+            raise ValueError(f"{spec.key_env} environment variable not set")
+        if base_url is None and spec.base_url_env:
+            base_url = os.environ.get(spec.base_url_env)
+        base_url = base_url or spec.default_base_url
+        sdk = load_sdk(spec.sdk)
+        if sdk is None:
+            raise ImportError(f"{spec.sdk} package not installed")
+        return spec, sdk, api_key, base_url
+
+    @staticmethod
+    def _build(cls, api_key: str, base_url: str, http):
+        kwargs = {"api_key": api_key, "http_client": http}
+        if base_url:
+            kwargs["base_url"] = base_url
+        return cls(**kwargs)
+
+    def get_client(self, provider: str, api_key: str = None, base_url: str = None):
+        """
+        Synchronous SDK client for a provider.
+
+        The key and base URL default to the provider's environment variables.
+        Per-call settings belong in client.with_options(...), which keeps the
+        shared connection pool.
+        """
+        spec, sdk, api_key, base_url = self._settings(provider, api_key, base_url)
+        key = _credential_key(api_key, base_url)
+        with self._lock:
+            cached = self._sync_clients.get(provider)
+            if cached is None or cached[0] != key:
+                client = self._build(getattr(sdk, spec.sync_class), api_key, base_url, self.http_client())
+                cached = self._sync_clients[provider] = (key, client)
+            return cached[1]
+
+    def get_async_client(self, provider: str, api_key: str = None, base_url: str = None):
+        """Asynchronous SDK client for a provider, bound to the running event loop."""
+        spec, sdk, api_key, base_url = self._settings(provider, api_key, base_url)
+        key = _credential_key(api_key, base_url)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            http = self.async_http_client()
+            clients = self._async_clients[loop]
+            cached = clients.get(provider)
+            if cached is None or cached[0] != key:
+                client = self._build(getattr(sdk, spec.async_class), api_key, base_url, http)
+                cached = clients[provider] = (key, client)
+            return cached[1]
+
+    async def aclose(self) -> None:
+        """Close the running loop's connections; call before the loop ends."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_http.pop(loop, None)
+            self._async_clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self) -> None:
+        """Close the synchronous connections."""
+        with self._lock:
+            client, self._sync_http = self._sync_http, None
+            self._sync_clients.clear()
+        if client is not None:
+            client.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ClientPool:
+    """The process-wide ClientPool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ClientPool()
+        return _pool
@@ -0,0 +1,42 @@
+"""
+Rolling latency window shared by the modules that report percentiles.
+
+probe_monitor keeps one per probe, provider_router one per provider (time to
+first token) and batch_runner one per job. A bounded deque of the most
+recent samples, with nearest-rank percentiles computed on demand.
+
+Usage:
+    from latency_window import LatencyWindow
+    window = LatencyWindow(100)
+    window.add(0.42)
+    window.summary()   # {"samples": 1, "p50": 0.42, "p95": 0.42, "p99": 0.42}
+"""
+
+import collections
+import math
+
+
+class LatencyWindow:
+    """Rolling window of the most recent latencies, in seconds."""
+
+    def __init__(self, size: int = 100):
+        self.samples = collections.deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, q: float):
+        """Nearest-rank percentile (q in 0..100), or None without samples."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        rank = math.ceil(q / 100 * len(ordered))
+        return ordered[max(0, min(len(ordered), rank) - 1)]
+
+    def summary(self) -> dict:
+        return {
+            "samples": len(self.samples),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
@@ -0,0 +1,146 @@
+"""
+Token-budgeted sliding window over the graph's messages.
+
+add_messages keeps every message of a thread, so the state, each checkpoint
+and the prompt grow with the conversation. MessageWindow is a drop-in
+reducer for State["messages"] that merges updates the way add_messages does,
+then keeps the list within MESSAGE_WINDOW_TOKENS (4000): once the budget is
+exceeded, the oldest messages are folded into a running summary (a system
+message at the head of the list) until the window is back under
+MESSAGE_WINDOW_TARGET_TOKENS (3/4 of the budget). Evicting below the budget
+means folds happen every few turns rather than every turn, so most
+checkpoints can still be written as deltas (see checkpoint_serde).
+
+Leading system prompts are kept. The window always starts at a human
+message and keeps the newest turn even if it alone is over budget. The
+summary keeps one line per folded message (MESSAGE_WINDOW_LINE_CHARS, 200)
+and drops its oldest lines past MESSAGE_WINDOW_SUMMARY_TOKENS (500); pass
+summarize= to fold differently.
+
+Token counts are estimated once per message (the provider's usage for
+replies that report it, otherwise LangChain's approximate count) and kept in
+the message's response_metadata, so they are stored with the checkpoint and
+never recomputed. The count is written into the message objects the reducer
+is given, as add_messages writes missing ids into them: a caller holding
+one of those messages sees response_metadata["token_count"] appear.
+MESSAGE_WINDOW_TOKENS=0 keeps every message.
+
+Usage:
+    from message_window import window_messages
+
+    class State(TypedDict):
+        messages: Annotated[list, window_messages]
+"""
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.graph.message import add_messages
+
+from api_utils import get_timeout
+
+SUMMARY_ID = "message-window-summary"
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+TOKEN_COUNT_KEY = "token_count"
+
+# Message types as the summary lines name them
+SPEAKERS = {"human": "user", "ai": "assistant", "system": "system", "tool": "tool"}
+
+
+def token_count(message) -> int:
+    """Tokens of a message, counted on first use and kept in (so mutating) its response_metadata."""
+    count = message.response_metadata.get(TOKEN_COUNT_KEY)
+    if count is None:
+        usage = getattr(message, "usage_metadata", None)
+        if usage and usage.get("output_tokens"):
+            count = usage["output_tokens"]
+        else:
+            count = count_tokens_approximately([message])
+        message.response_metadata[TOKEN_COUNT_KEY] = count
+    return count
+
+
+def _is_summary(message) -> bool:
+    return isinstance(message, SystemMessage) and message.id == SUMMARY_ID
+
+
+def _text(message) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    # Content blocks: keep their text parts
+    return " ".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in message.content)
+
+
+class MessageWindow:
+    """
+    Reducer keeping a thread's messages within a token budget.
+
+    Calls are independent, so one instance can serve every thread. Like
+    add_messages, it updates the messages it is given in place: each one
+    gets its token count in response_metadata.
+    """
+
+    def __init__(self, max_tokens: int = None, target_tokens: int = None, summary_tokens: int = None,
+                 line_chars: int = None, summarize=None):
+        self.max_tokens = get_timeout("MESSAGE_WINDOW_TOKENS", 4000) if max_tokens is None else max_tokens
+        self.target_tokens = target_tokens or get_timeout("MESSAGE_WINDOW_TARGET_TOKENS", self.max_tokens * 3 // 4)
+        self.summary_tokens = summary_tokens or get_timeout("MESSAGE_WINDOW_SUMMARY_TOKENS", 500)
+        self.line_chars = line_chars or get_timeout("MESSAGE_WINDOW_LINE_CHARS", 200)
+        # summarize(summary text or None, folded messages) -> new summary text
+        self.summarize = summarize or self._fold_lines
+
+    def __call__(self, left, right) -> list:
+        messages = add_messages(left, right)
+        if not self.max_tokens:
+            return messages
+        total = sum(token_count(m) for m in messages)
+        if total <= self.max_tokens:
+            return messages
+
+        # Leading system prompts stay; the summary follows them
+        start = 0
+        while start < len(messages) and isinstance(messages[start], SystemMessage) and not _is_summary(messages[start]):
+            start += 1
+        pinned = messages[:start]
+        summary = messages[start] if start < len(messages) and _is_summary(messages[start]) else None
+        window = messages[start + (summary is not None):]
+        total = sum(token_count(m) for m in window)
+        budget = self.target_tokens - sum(token_count(m) for m in pinned)
+        if summary is not None:
+            budget -= token_count(summary)
+        # Oldest first, down to the target, then on to the start of a human
+        # turn, but never past the start of the newest one
+        last_turn = max((i for i, m in enumerate(window) if isinstance(m, HumanMessage)), default=len(window) - 1)
+        cut = 0
+        while cut < last_turn and (total > budget or not isinstance(window[cut], HumanMessage)):
+            total -= token_count(window[cut])
+            cut += 1
+        if cut == 0:
+            return messages
+
+        text = self.summarize(summary.content if summary is not None else None, window[:cut])
+        summary = SystemMessage(content=text, id=SUMMARY_ID)
+        token_count(summary)
+        return [*pinned, summary, *window[cut:]]
+
+    def _fold_lines(self, summary: str, folded: list) -> str:
+        """The summary with a line per folded message, trimmed to summary_tokens from the oldest line."""
+        lines = summary.splitlines()[1:] if summary else []
+        for message in folded:
+            if _is_summary(message):
+                continue
+            text = " ".join(_text(message).split())
+            if len(text) > self.line_chars:
+                text = text[:self.line_chars - 3] + "..."
+            if isinstance(message, AIMessage) and message.tool_calls:
+                calls = ", ".join(call["name"] for call in message.tool_calls)
+                text = f"{text} [called {calls}]".lstrip()
+            if text:
+                lines.append(f"- {SPEAKERS.get(message.type, message.type)}: {text}")
+        # Same estimate as count_tokens_approximately, without building a message per try
+        size = len(SUMMARY_HEADER) + sum(len(line) + 1 for line in lines)
+        while len(lines) > 1 and size / 4 > self.summary_tokens:
+            size -= len(lines.pop(0)) + 1
+        return "\n".join([SUMMARY_HEADER, *lines])
+
+
+window_messages = MessageWindow()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Long-running provider health monitor built on the api_utils probes.
+
+Re-probes every provider on a jittered schedule, keeps a circuit breaker per
+provider, and serves the current state on a local HTTP endpoint so agents can
+check one in-memory source of truth instead of discovering outages by timing
+out on real requests:
+
+  GET /health    JSON: breaker state, last result and latency percentiles
+  GET /metrics   Prometheus text exposition format
+
+Usage:
+  python3 probe_monitor.py --port 8765 --interval 60
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from api_utils import (
+    API_PROBES,
+    ProbeClient,
+    format_prometheus,
+    get_timeout,
+    probe_all,
+    prometheus_label,
+)
+from client_pool import get_pool
+from latency_window import LatencyWindow
+from rate_limit import format_prometheus as format_rate_limits, limiter_stats
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+
+    After failure_threshold consecutive failures the breaker opens and the
+    provider is not probed until the open period passes; then one half-open
+    trial probe decides between closing again and re-opening. Each re-open
+    doubles the open period, up to max_open_seconds.
+    """
+
+    def __init__(self, failure_threshold: int = 3, open_seconds: float = 30.0,
+                 max_open_seconds: float = 600.0):
+        self.failure_threshold = failure_threshold
+        self.base_open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_seconds = open_seconds
+        self.opened_at = None
+
+    def allow(self, now: float = None) -> bool:
+        """Whether the provider should be probed now (moves open -> half-open when due)."""
+        now = time.monotonic() if now is None else now
+        if self.state == OPEN and now - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+        return self.state != OPEN
+
+    def record(self, ok: bool, now: float = None) -> None:
+        now = time.monotonic() if now is None else now
+        if ok:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.open_seconds = self.base_open_seconds
+            return
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN:
+            # Trial failed: back off further
+            self.open_seconds = min(self.open_seconds * 2, self.max_open_seconds)
+            self._open(now)
+        elif self.consecutive_failures >= self.failure_threshold:
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self.opened_at = now
+
+    def retry_in(self, now: float = None) -> float:
+        """Seconds until an open breaker allows a trial probe (0 otherwise)."""
+        if self.state != OPEN:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.opened_at + self.open_seconds - now)
+
+
+class ProbeMonitor:
+    """
+    Re-probes providers on a jittered schedule and keeps their health state.
+
+    The state is rendered to JSON and Prometheus text once per round, so
+    readers only copy a pre-built bytes object under a lock.
+    """
+
+    def __init__(self, probes=None, interval: float = 60.0, jitter: float = 0.2,
+                 breaker_factory=CircuitBreaker, window: int = 100, quiet: bool = False):
+        self.probes = probes or API_PROBES
+        self.interval = interval
+        self.jitter = jitter
+        self.quiet = quiet
+        self.breakers = {name: breaker_factory() for name, _ in self.probes}
+        self.latencies = {name: LatencyWindow(window) for name, _ in self.probes}
+        self.results = {}
+        self.checked_at = {}
+        self._lock = threading.Lock()
+        self._health_json = b"{}"
+        self._metrics_text = b""
+        self.rounds = 0
+
+    def next_delay(self) -> float:
+        """Interval with +/- jitter so many monitors do not probe in lockstep."""
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def probe_once(self, http: ProbeClient) -> None:
+        """Probe every provider whose breaker allows it and publish the new state."""
+        due = [(name, probe) for name, probe in self.probes if self.breakers[name].allow()]
+        if due:
+            budget = get_timeout("API_CHECK_BUDGET", 30)
+            output = io.StringIO() if self.quiet else None
+            with contextlib.redirect_stdout(output) if output else contextlib.nullcontext():
+                results = await probe_all(budget=budget, probes=due, http=http, refresh=True)
+            now = time.time()
+            for name, result in results.items():
+                self.breakers[name].record(result.ok)
+                self.latencies[name].add(result.timings.get("total", 0.0))
+                self.results[name] = result
+                self.checked_at[name] = now
+        self.rounds += 1
+        self._publish()
+
+    async def run(self, stop: asyncio.Event = None) -> None:
+        """Probe until stop is set, reusing one pooled client for the daemon's lifetime."""
+        stop = stop or asyncio.Event()
+        try:
+            async with ProbeClient() as http:
+                while not stop.is_set():
+                    await self.probe_once(http)
+                    try:
+                        await asyncio.wait_for(stop.wait(), self.next_delay())
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            await get_pool().aclose()
+
+    def snapshot(self) -> dict:
+        """Current health state of every provider."""
+        providers = {}
+        for name, _ in self.probes:
+            breaker = self.breakers[name]
+            result = self.results.get(name)
+            providers[name] = {
+                "state": breaker.state,
+                "consecutive_failures": breaker.consecutive_failures,
+                "retry_in": round(breaker.retry_in(), 3),
+                "checked_at": self.checked_at.get(name),
+                "last_result": result.to_dict() if result else None,
+                "latency": self.latencies[name].summary(),
+            }
+        return {"rounds": self.rounds, "providers": providers, "rate_limits": limiter_stats()}
+
+    def _metrics(self) -> str:
+        lines = [
+            "# HELP api_probe_breaker_state Circuit breaker state (0 closed, 1 half-open, 2 open).",
+            "# TYPE api_probe_breaker_state gauge",
+        ]
+        codes = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+        for name, breaker in self.breakers.items():
+            lines.append(f'api_probe_breaker_state{{provider="{prometheus_label(name)}"}} {codes[breaker.state]}')
+        lines += [
+            "# HELP api_probe_latency_seconds Rolling probe latency percentiles.",
+            "# TYPE api_probe_latency_seconds gauge",
+        ]
+        for name, window in self.latencies.items():
+            for q in (50, 95, 99):
+                value = window.percentile(q)
+                if value is not None:
+                    lines.append(
+                        f'api_probe_latency_seconds{{provider="{prometheus_label(name)}",'
+                        f'quantile="{q / 100}"}} {value:.6f}'
+                    )
+        return format_prometheus(self.results) + "\n".join(lines) + "\n" + format_rate_limits()
+
+    def _publish(self) -> None:
+        health = json.dumps(self.snapshot()).encode("utf-8")
+        metrics = self._metrics().encode("utf-8")
+        with self._lock:
+            self._health_json = health
+            self._metrics_text = metrics
+
+    def rendered(self, kind: str) -> bytes:
+        with self._lock:
+            return self._health_json if kind == "health" else self._metrics_text
+
+
+def make_handler(monitor: ProbeMonitor):
+    """HTTP handler class serving the monitor's pre-rendered state."""
+
+    class MonitorHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if path in ("", "/health"):
+                body, content_type = monitor.rendered("health"), "application/json"
+            elif path == "/metrics":
+                body, content_type = monitor.rendered("metrics"), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MonitorHandler
+
+
+def serve(monitor: ProbeMonitor, host: str, port: int) -> ThreadingHTTPServer:
+    """Start the state endpoint on a background thread."""
+    server = ThreadingHTTPServer((host, port), make_handler(monitor))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="probe-monitor-http", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continuously monitor provider API health.")
+    parser.add_argument("--host", default="127.0.0.1", help="address for the state endpoint")
+    parser.add_argument("--port", type=int, default=get_timeout("PROBE_MONITOR_PORT", 8765))
+    parser.add_argument("--interval", type=float, default=get_timeout("PROBE_MONITOR_INTERVAL", 60),
+                        help="seconds between probe rounds (before jitter)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="relative jitter of the interval")
+    parser.add_argument("--failure-threshold", type=int, default=3,
+                        help="consecutive failures that open a provider's breaker")
+    parser.add_argument("--open-seconds", type=float, default=30.0,
+                        help="initial open period before a half-open trial probe")
+    parser.add_argument("--max-open-seconds", type=float, default=600.0,
+                        help="upper bound for the exponentially growing open period")
+    parser.add_argument("--quiet", action="store_true", help="suppress per-probe output")
+    parser.add_argument("--watch-secrets", action="store_true",
+                        help="apply rotated secrets from /run/secrets.yaml (SECRETS_FILE) without restarting")
+    args = parser.parse_args()
+
+    monitor = ProbeMonitor(
+        interval=args.interval,
+        jitter=args.jitter,
+        breaker_factory=lambda: CircuitBreaker(args.failure_threshold, args.open_seconds, args.max_open_seconds),
+        quiet=args.quiet,
+    )
+    if args.watch_secrets:
+        from secret_watcher import start_watcher
+        watcher = start_watcher()
+        # Rotated keys are used from the next round; report them without values
+        watcher.subscribe(lambda changed: print(f"🔄 Secrets rotated: {', '.join(sorted(changed))}"))
+    server = serve(monitor, args.host, args.port)
+    print(f"🩺 Probe monitor serving http://{args.host}:{server.server_port}/health and /metrics")
+    try:
+        asyncio.run(monitor.run())
+    except KeyboardInterrupt:
+        print("👋 Probe monitor stopped")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
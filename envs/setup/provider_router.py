@@ -0,0 +1,260 @@
+"""
+Latency-aware choice of LLM provider for the graph's model calls.
+
+ProviderRouter keeps, per provider, a rolling window of time-to-first-token
+latencies and call outcomes from real calls. The outcomes are seeded from
+the api_utils probe results (a fresh run, or the probe cache so start-up
+stays offline); the latency windows start empty, as the probes time other
+requests than a streamed chat's first token. It ranks the providers that
+have a key by expected latency:
+
+    latency / (1 - error rate) + wait expected by the provider's rate limiter
+
+where latency is the window's p95 (p50 until ROUTER_MIN_SAMPLES calls were
+seen, ROUTER_DEFAULT_LATENCY_MS for a provider not seen at all). A provider
+that slows down, fails or runs out of rate limit budget drops down the list.
+
+stream() sends the request to the best provider and falls back to the next
+when one fails before its first token. With hedge=True, if no token arrived
+after the best provider's p95 (clamped to ROUTER_HEDGE_MIN_MS..
+ROUTER_HEDGE_MAX_MS), the next best is asked too; the first one to stream
+wins and the other is cancelled. Hedging trades extra requests for a
+shorter tail, so it is opt-in.
+
+Usage:
+    from provider_router import get_router
+    async for text in get_router().stream(chat, hedge=True):
+        ...
+"""
+
+import asyncio
+import collections
+import contextlib
+import os
+import threading
+import time
+
+from api_utils import PROBE_TARGETS, ProbeCache, credential_fingerprint, get_timeout
+from chat_stream import stream_chat
+from client_pool import PROVIDERS
+from latency_window import LatencyWindow
+from rate_limit import get_limiter
+
+
+class ProviderStats:
+    """Rolling time-to-first-token latencies and outcomes of one provider."""
+
+    def __init__(self, size: int = 100):
+        self.latencies = LatencyWindow(size)
+        self.outcomes = collections.deque(maxlen=size)
+
+    def record(self, latency: float, ok: bool) -> None:
+        """Record a call; ok=None records only a latency (a call hedged away)."""
+        # Failures count against the error rate; they do not say how fast it is
+        if ok is not False and latency is not None:
+            self.latencies.add(latency)
+        if ok is not None:
+            self.outcomes.append(ok)
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def summary(self) -> dict:
+        return {**self.latencies.summary(), "calls": len(self.outcomes), "error_rate": round(self.error_rate, 3)}
+
+
+class ProviderRouter:
+    """
+    Ranks providers by expected latency and streams from the best one.
+
+    Safe to share between threads and event loops; stats are updated under
+    a lock.
+    """
+
+    def __init__(self, providers: list = None, window: int = None):
+        configured = os.environ.get("ROUTER_PROVIDERS")
+        self.providers = providers or (
+            [p.strip() for p in configured.split(",") if p.strip()] if configured else list(PROVIDERS)
+        )
+        self.window = window or get_timeout("ROUTER_WINDOW", 100)
+        self.stats = {provider: ProviderStats(self.window) for provider in self.providers}
+        self.min_samples = get_timeout("ROUTER_MIN_SAMPLES", 5)
+        self.default_latency = get_timeout("ROUTER_DEFAULT_LATENCY_MS", 1000) / 1000
+        self.hedge_min = get_timeout("ROUTER_HEDGE_MIN_MS", 200) / 1000
+        self.hedge_max = get_timeout("ROUTER_HEDGE_MAX_MS", 5000) / 1000
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def _stats(self, provider: str) -> ProviderStats:
+        # Callers hold the lock; providers outside self.providers get stats on first use
+        if provider not in self.stats:
+            self.stats[provider] = ProviderStats(self.window)
+        return self.stats[provider]
+
+    def record(self, provider: str, latency: float, ok: bool) -> None:
+        with self._lock:
+            self._stats(provider).record(latency, ok)
+
+    def seed_from_probes(self, results: dict) -> None:
+        """Record probe outcomes (probe name -> ProbeResult, as probe_all returns them), not their latencies."""
+        for name, result in results.items():
+            target = PROBE_TARGETS.get(name)
+            if target is None or target.mode_provider not in self.stats or result.cached:
+                continue
+            # A model listing's first byte says nothing about time to first token
+            self.record(target.mode_provider, None, result.ok)
+
+    def seed_from_cache(self, cache: ProbeCache = None) -> None:
+        """Record the outcomes of the fresh results in the probe cache, without probing."""
+        cache = cache or ProbeCache()
+        for name, target in PROBE_TARGETS.items():
+            if target.mode_provider not in self.stats:
+                continue
+            entry = cache.get(credential_fingerprint(name))
+            if entry is not None:
+                self.record(target.mode_provider, None, entry["ok"])
+
+    def available(self) -> list:
+        """Providers whose key is set."""
+        return [p for p in self.providers if p in PROVIDERS and os.environ.get(PROVIDERS[p].key_env)]
+
+    def latency(self, provider: str) -> float:
+        """Expected time to first token from the window, before errors and rate limits."""
+        with self._lock:
+            window = self._stats(provider).latencies
+            if not window.samples:
+                return self.default_latency
+            return window.percentile(95 if len(window.samples) >= self.min_samples else 50)
+
+    def score(self, provider: str) -> float:
+        """Expected seconds to the first token; lower is better."""
+        with self._lock:
+            error_rate = self._stats(provider).error_rate
+        # Every failed attempt costs another try, so divide by the success rate
+        return self.latency(provider) / max(0.05, 1.0 - error_rate) + get_limiter(provider).expected_wait()
+
+    def rank(self, providers: list = None) -> list:
+        """Providers (default: the available ones), best first."""
+        providers = self.available() if providers is None else providers
+        return sorted(providers, key=self.score) if len(providers) > 1 else list(providers)
+
+    def hedge_delay(self, provider: str) -> float:
+        with self._lock:
+            window = self._stats(provider).latencies
+            p95 = window.percentile(95) if len(window.samples) >= self.min_samples else None
+        return min(self.hedge_max, max(self.hedge_min, p95 if p95 is not None else self.hedge_max))
+
+    async def _open(self, provider: str, chat: list):
+        """Start streaming from provider; returns (stream, first chunk) once the first token is in."""
+        started = time.monotonic()
+        stream = stream_chat(provider, chat)
+        try:
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            first = ""
+        except asyncio.CancelledError:
+            # Hedged away: it took at least this long, which its window should know
+            await stream.aclose()
+            self.record(provider, time.monotonic() - started, None)
+            raise
+        except Exception:
+            await stream.aclose()
+            self.record(provider, None, False)
+            raise
+        self.record(provider, time.monotonic() - started, True)
+        return stream, first
+
+    async def _open_hedged(self, ranked: list, chat: list):
+        """_open() the best provider, asking the next best too if it is slow; returns (provider, stream, first)."""
+        tasks = {asyncio.ensure_future(self._open(ranked[0], chat)): ranked[0]}
+        waiting = ranked[1:]
+        timeout = self.hedge_delay(ranked[0]) if waiting else None
+        error = None
+        try:
+            while tasks:
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Slower than its p95: send the same request to the next best
+                    provider = waiting.pop(0)
+                    tasks[asyncio.ensure_future(self._open(provider, chat))] = provider
+                    with self._lock:
+                        self.hedges += 1
+                    timeout = None
+                    continue
+                for task in done:
+                    provider = tasks.pop(task)
+                    if task.exception() is None:
+                        if provider != ranked[0]:
+                            with self._lock:
+                                self.hedge_wins += 1
+                        stream, first = task.result()
+                        return provider, stream, first
+                    error = task.exception()
+                if not tasks and waiting:
+                    # Every request so far failed before streaming: fail over
+                    provider = waiting.pop(0)
+                    tasks[asyncio.ensure_future(self._open(provider, chat))] = provider
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            for outcome in await asyncio.gather(*tasks, return_exceptions=True):
+                if isinstance(outcome, tuple):
+                    # A loser that got its first token too: hang up on it
+                    await outcome[0].aclose()
+
+    async def stream(self, chat: list, providers: list = None, hedge: bool = False):
+        """
+        Yield the reply to chat as text chunks from the best provider.
+
+        Providers are tried in rank order (default: all available) until one
+        streams; errors after the first token are raised to the caller.
+        """
+        ranked = self.rank(providers)
+        if not ranked:
+            raise ValueError("no provider available: set one of "
+                             + ", ".join(PROVIDERS[p].key_env for p in self.providers if p in PROVIDERS))
+        if hedge:
+            _, stream, first = await self._open_hedged(ranked, chat)
+        else:
+            for i, provider in enumerate(ranked):
+                try:
+                    stream, first = await self._open(provider, chat)
+                    break
+                except Exception:
+                    if i == len(ranked) - 1:
+                        raise
+        async with contextlib.aclosing(stream):
+            if first:
+                yield first
+            async for text in stream:
+                yield text
+
+    def summary(self) -> dict:
+        """Per-provider window statistics and score, plus hedging counters."""
+        providers = {}
+        with self._lock:
+            names = list(self.stats)
+        for provider in names:
+            with self._lock:
+                summary = self.stats[provider].summary()
+            if provider in PROVIDERS:
+                summary["score"] = round(self.score(provider), 6)
+            providers[provider] = summary
+        return {"providers": providers, "hedges": self.hedges, "hedge_wins": self.hedge_wins}
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ProviderRouter:
+    """The process-wide ProviderRouter, seeded from the probe cache on first use."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ProviderRouter()
+            _router.seed_from_cache()
+        return _router
@@ -0,0 +1,439 @@
+"""
+Per-provider rate limiting and Retry-After-aware retries.
+
+Each provider gets a RateLimiter with optional requests-per-minute and
+tokens-per-minute token buckets (RATE_LIMIT_<PROVIDER>_RPM / _TPM, unset or
+0 = unlimited). Callers reserve capacity before a request and wait their turn,
+so a burst queues smoothly instead of turning into a burst of 429s. Rate limit
+headers on responses (Retry-After, x-ratelimit-*, anthropic-ratelimit-*) tighten
+the buckets and pause the provider for everyone in the process when the server
+says its budget is spent.
+
+RetryScheduler retries 429s, 5xx and transport errors with decorrelated-jitter
+backoff, never sooner than the server asked. Both work from threads (acquire,
+call) and from asyncio tasks (acquire_async, acall).
+
+Usage:
+    from rate_limit import RetryScheduler, get_limiter
+    scheduler = RetryScheduler(get_limiter("openai"))
+    response = await scheduler.acall(lambda: client.chat.completions.create(...), tokens=512)
+"""
+
+import asyncio
+import email.utils
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from api_utils import get_timeout, prometheus_label
+
+# Hosts of every provider api_utils talks to, for limiting by URL
+HOST_PROVIDERS = {
+    "api.openai.com": "openai",
+    "api.anthropic.com": "anthropic",
+    "generativelanguage.googleapis.com": "gemini",
+    "api.x.ai": "grok",
+    "api.github.com": "github",
+    "app.terraform.io": "terraform",
+    "hub.docker.com": "dockerhub",
+    "pypi.org": "pypi",
+    "upload.pypi.org": "pypi",
+}
+
+# Responses worth retrying (529: Anthropic "overloaded"); a 409 conflict is
+# not transient, so it is left to the caller
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504, 529}
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATIONS = re.compile(r"(?:\d+(?:\.\d+)?(?:ms|h|m|s))+")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_reset(value: str):
+    """
+    Seconds until a rate limit resets, from any format providers use.
+
+    Accepts plain seconds, Unix timestamps (GitHub), durations like "6m0s"
+    or "20ms" (OpenAI), RFC 3339 (Anthropic) and HTTP dates (Retry-After).
+    Returns None for values it cannot read.
+    """
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        number = float(value)
+        return max(0.0, number - time.time()) if number > 1e9 else max(0.0, number)
+    except ValueError:
+        pass
+    if _DURATIONS.fullmatch(value):
+        return sum(float(n) * _DURATION_UNITS[unit] for n, unit in _DURATION.findall(value))
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            moment = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+def retry_after(headers) -> float:
+    """Delay the server asked for (Retry-After / retry-after-ms), or None."""
+    if headers is None:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    return parse_reset(headers.get("retry-after"))
+
+
+def _remaining_and_reset(headers, kind: str):
+    """(remaining, seconds to reset) for "requests" or "tokens" from either header family."""
+    remaining = headers.get(f"x-ratelimit-remaining-{kind}") or headers.get(f"anthropic-ratelimit-{kind}-remaining")
+    reset = headers.get(f"x-ratelimit-reset-{kind}") or headers.get(f"anthropic-ratelimit-{kind}-reset")
+    if kind == "requests" and remaining is None:
+        # GitHub and others: one unsuffixed request budget
+        remaining, reset = headers.get("x-ratelimit-remaining"), headers.get("x-ratelimit-reset")
+    try:
+        remaining = float(remaining) if remaining is not None else None
+    except ValueError:
+        remaining = None
+    return remaining, parse_reset(reset)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at per_minute, holding at most capacity.
+
+    reserve() never blocks: it takes the tokens straight away, letting the
+    level go negative, and returns how long the caller must wait before using
+    them. Concurrent callers therefore queue in arrival order instead of
+    racing each other for every refill.
+    """
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float = 1.0, now: float = None) -> float:
+        """Take amount tokens; returns the seconds to wait before they are available."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._refill(now)
+            self.level -= amount
+            return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def wait(self, amount: float = 1.0, now: float = None) -> float:
+        """Seconds until amount tokens would be available, without taking them."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._refill(now)
+            return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def refund(self, amount: float) -> None:
+        with self._lock:
+            self.level = min(self.capacity, self.level + amount)
+
+    def limit_to(self, remaining: float, now: float = None) -> None:
+        """Never believe more tokens are left than the server reports."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._refill(now)
+            self.level = min(self.level, remaining)
+
+
+class RateLimitExceeded(Exception):
+    """Waiting for rate limit capacity would take longer than the caller allows."""
+    error_class = "rate_limited"
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits of one provider.
+
+    Shared by every thread and event loop in the process; the counters are
+    exported by stats() and format_prometheus().
+    """
+
+    def __init__(self, name: str, rpm: float = 0, tpm: float = 0):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.acquired = 0
+        self.throttled = 0
+        self.throttle_seconds = 0.0
+        self.retries = 0
+
+    def _reserve(self, tokens: float, max_wait: float = None) -> float:
+        now = time.monotonic()
+        delay = 0.0
+        if self.requests:
+            delay = max(delay, self.requests.reserve(1, now))
+        if self.tokens and tokens:
+            delay = max(delay, self.tokens.reserve(tokens, now))
+        with self._lock:
+            delay = max(delay, self.paused_until - now)
+            if max_wait is not None and delay > max_wait:
+                # Give the capacity back to the callers that can wait for it
+                self._refund(tokens)
+                raise RateLimitExceeded(
+                    f"{self.name}: rate limit capacity in {delay:.1f}s, more than the {max_wait:.1f}s allowed"
+                )
+            self.acquired += 1
+            if delay > 0:
+                self.throttled += 1
+                self.throttle_seconds += delay
+                self.queue_depth += 1
+                self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        return delay
+
+    def _refund(self, tokens: float) -> None:
+        """Return a reservation that will not be used."""
+        if self.requests:
+            self.requests.refund(1)
+        if self.tokens and tokens:
+            self.tokens.refund(tokens)
+
+    def _dequeue(self) -> None:
+        with self._lock:
+            self.queue_depth -= 1
+
+    def acquire(self, tokens: float = 0, max_wait: float = None) -> float:
+        """Block the thread until a request (and tokens) may be sent; returns the wait."""
+        delay = self._reserve(tokens, max_wait)
+        if delay > 0:
+            try:
+                time.sleep(delay)
+            finally:
+                self._dequeue()
+        return delay
+
+    async def acquire_async(self, tokens: float = 0, max_wait: float = None) -> float:
+        """
+        acquire() for asyncio tasks.
+
+        A task cancelled while it waits (a timeout, or a hedged call that
+        lost) never sends its request, so its reservation is given back.
+        """
+        delay = self._reserve(tokens, max_wait)
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._refund(tokens)
+                with self._lock:
+                    self.acquired -= 1
+                raise
+            finally:
+                self._dequeue()
+        return delay
+
+    def observe(self, status_code: int, headers) -> None:
+        """Tighten the limits from a response's rate limit headers."""
+        if headers is None:
+            return
+        now = time.monotonic()
+        pause = 0.0
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            remaining, reset = _remaining_and_reset(headers, kind)
+            if remaining is None:
+                continue
+            if bucket is not None:
+                bucket.limit_to(remaining, now)
+            if remaining <= 0 and reset:
+                pause = max(pause, reset)
+        if status_code == 429:
+            pause = max(pause, retry_after(headers) or 0.0)
+        if pause > 0:
+            with self._lock:
+                self.paused_until = max(self.paused_until, now + pause)
+
+    def expected_wait(self, tokens: float = 0) -> float:
+        """How long a request sent now would wait for capacity (nothing is reserved)."""
+        now = time.monotonic()
+        delay = max(0.0, self.paused_until - now)
+        if self.requests:
+            delay = max(delay, self.requests.wait(1, now))
+        if self.tokens and tokens:
+            delay = max(delay, self.tokens.wait(tokens, now))
+        return delay
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "acquired": self.acquired,
+                "throttled": self.throttled,
+                "throttle_seconds": round(self.throttle_seconds, 6),
+                "retries": self.retries,
+                "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 3),
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> RateLimiter:
+    """The process-wide limiter of a provider, configured from RATE_LIMIT_<PROVIDER>_RPM/_TPM."""
+    provider = provider.lower()
+    with _limiters_lock:
+        if provider not in _limiters:
+            prefix = f"RATE_LIMIT_{provider.upper()}"
+            _limiters[provider] = RateLimiter(
+                provider, get_timeout(f"{prefix}_RPM", 0), get_timeout(f"{prefix}_TPM", 0)
+            )
+        return _limiters[provider]
+
+
+def limiter_for_host(host: str) -> RateLimiter:
+    """Limiter of the provider serving host, or None for unknown hosts."""
+    provider = HOST_PROVIDERS.get(host)
+    return get_limiter(provider) if provider else None
+
+
+def _response_of(outcome):
+    """The HTTP response behind a result or an SDK/httpx exception, if any."""
+    if hasattr(outcome, "status_code") and isinstance(getattr(outcome, "headers", None), httpx.Headers):
+        return outcome
+    response = getattr(outcome, "response", None)
+    return response if isinstance(response, httpx.Response) else None
+
+
+class RetryScheduler:
+    """
+    Retries a call on 429s, 5xx and transport errors.
+
+    Delays follow decorrelated jitter (sleep = uniform(base, 3 * previous
+    sleep), capped), but are never shorter than Retry-After or the reset of
+    an exhausted x-ratelimit-* budget. Every attempt first waits for the
+    limiter, and a retry that would not fit into budget seconds is not made.
+    """
+
+    def __init__(self, limiter: RateLimiter = None, max_attempts: int = None,
+                 base: float = 0.5, cap: float = 30.0, budget: float = None):
+        self.limiter = limiter
+        self.max_attempts = max_attempts or get_timeout("RATE_LIMIT_MAX_ATTEMPTS", 4)
+        self.base = base
+        self.cap = cap
+        self.budget = budget
+
+    def _delay(self, previous: float, response) -> float:
+        delay = min(self.cap, random.uniform(self.base, max(self.base, previous * 3)))
+        if response is not None:
+            asked = retry_after(response.headers)
+            for kind in ("requests", "tokens"):
+                remaining, reset = _remaining_and_reset(response.headers, kind)
+                if remaining is not None and remaining <= 0 and reset:
+                    asked = max(asked or 0.0, reset)
+            if asked is not None:
+                delay = max(delay, asked)
+        return delay
+
+    def _next(self, outcome, attempt: int, previous: float, started: float):
+        """Delay before the next attempt, or None to stop and hand back outcome."""
+        response = _response_of(outcome)
+        if response is not None and self.limiter is not None:
+            self.limiter.observe(response.status_code, response.headers)
+        if isinstance(outcome, BaseException):
+            retryable = (response is not None and response.status_code in RETRY_STATUSES) or (
+                response is None and isinstance(outcome, httpx.TransportError)
+            )
+        else:
+            retryable = response is not None and response.status_code in RETRY_STATUSES
+        if not retryable or attempt >= self.max_attempts:
+            return None
+        delay = self._delay(previous, response)
+        if self.budget is not None and time.monotonic() - started + delay > self.budget:
+            return None
+        if self.limiter is not None:
+            self.limiter.record_retry()
+        return delay
+
+    def _remaining(self, started: float):
+        return None if self.budget is None else max(0.0, self.budget - (time.monotonic() - started))
+
+    def call(self, fn, *args, tokens: float = 0, **kwargs):
+        """Call fn(*args, **kwargs) from a thread, retrying as needed."""
+        started, previous = time.monotonic(), self.base
+        for attempt in range(1, self.max_attempts + 1):
+            if self.limiter is not None:
+                self.limiter.acquire(tokens, max_wait=self._remaining(started))
+            try:
+                outcome = fn(*args, **kwargs)
+            except Exception as e:
+                outcome = e
+            delay = self._next(outcome, attempt, previous, started)
+            if delay is None:
+                if isinstance(outcome, BaseException):
+                    raise outcome
+                return outcome
+            time.sleep(delay)
+            previous = delay
+
+    async def acall(self, fn, *args, tokens: float = 0, **kwargs):
+        """Await fn(*args, **kwargs) from a task, retrying as needed."""
+        started, previous = time.monotonic(), self.base
+        for attempt in range(1, self.max_attempts + 1):
+            if self.limiter is not None:
+                await self.limiter.acquire_async(tokens, max_wait=self._remaining(started))
+            try:
+                outcome = await fn(*args, **kwargs)
+            except Exception as e:
+                outcome = e
+            delay = self._next(outcome, attempt, previous, started)
+            if delay is None:
+                if isinstance(outcome, BaseException):
+                    raise outcome
+                return outcome
+            await asyncio.sleep(delay)
+            previous = delay
+
+
+def limiter_stats() -> dict:
+    """stats() of every limiter used so far, by provider."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+def format_prometheus() -> str:
+    """Limiter metrics in the Prometheus text exposition format."""
+    metrics = [
+        ("api_rate_limit_queue_depth", "gauge", "queue_depth", "Callers currently waiting for capacity."),
+        ("api_rate_limit_acquired_total", "counter", "acquired", "Requests admitted by the limiter."),
+        ("api_rate_limit_throttled_total", "counter", "throttled", "Requests that had to wait."),
+        ("api_rate_limit_throttle_seconds_total", "counter", "throttle_seconds", "Total time spent waiting."),
+        ("api_rate_limit_retries_total", "counter", "retries", "Retries scheduled after retryable failures."),
+    ]
+    stats = limiter_stats()
+    lines = []
+    for metric, kind, key, description in metrics:
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} {kind}"]
+        for name, values in stats.items():
+            lines.append(f'{metric}{{provider="{prometheus_label(name)}"}} {values[key]}')
+    return "\n".join(lines) + "\n"
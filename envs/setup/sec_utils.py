@@ -14,13 +14,22 @@ For dev containers (docker/dev/Dockerfile):
 
 Mount secrets.yaml into dev container with:
   docker run … -v "$PWD/config/secrets.yaml":/run/secrets.yaml:ro …
+
+For secrets rotated while the container runs, mount the directory instead
+and point SECRETS_FILE at the file in it:
+  docker run … -v "$PWD/config":/run/secrets:ro -e SECRETS_FILE=/run/secrets/secrets.yaml …
 """
 
 import os
+import re
 import sys
+import time
 import base64
 import pathlib
 import binascii
+import tempfile
+import threading
+from collections.abc import Mapping
 
 # Import yaml with fallback
 try:
@@ -34,8 +43,11 @@ try:
 except ImportError:
     pass
 
-# Path inside container where the encoded YAML is mounted (dev only)
-_YAML_PATH = pathlib.Path("/run/secrets.yaml")
+# Path inside container where the encoded YAML is mounted (dev only).
+# SECRETS_FILE moves it, e.g. into a mounted directory, so that rotations
+# written by rename (a new inode) are visible; a single-file bind mount pins
+# the original inode and never sees them
+_YAML_PATH = pathlib.Path(os.environ.get("SECRETS_FILE", "/run/secrets.yaml"))
 
 # Expected secrets based on secrets_example.yaml
 EXPECTED_SECRETS = [
@@ -125,9 +137,9 @@ def _is_dev_environment() -> bool:
     )
 
 
-def _get_env_secrets() -> Dict[str, Optional[str]]:
-    """Get secrets from environment variables."""
-    env_secrets = {}
+def _raw_env_secrets() -> Dict[str, str]:
+    """Undecoded secrets present in environment variables."""
+    raw_secrets = {}
     for secret_key in EXPECTED_SECRETS:
         env_name = SECRET_ENV_MAPPING.get(secret_key, secret_key)
         raw_value = os.environ.get(env_name)
@@ -137,27 +149,35 @@ def _get_env_secrets() -> Dict[str, Optional[str]]:
             for alt_name in TFE_TOKEN_ALTERNATIVES:
                 raw_value = os.environ.get(alt_name)
                 if raw_value:
-                    env_name = alt_name  # Update env_name to the one that worked
                     break
         
         if raw_value:
             # Remove quotes if present (from .env file format)
-            raw_value = raw_value.strip('"\'')
-            
-            # Check if value is already decoded, use as-is; otherwise decode it
-            if (secret_key == "TF_API_KEY" and ".atlasv1." in raw_value) or \
-               (secret_key == "GITHUB_TOKEN" and raw_value.startswith("ghp_")) or \
-               (secret_key == "OPENAI_API_KEY" and raw_value.startswith("sk-")) or \
-               (secret_key == "ANTHROPIC_API_KEY" and raw_value.startswith("sk-ant-")) or \
-               (secret_key == "GOOGLE_API_KEY" and not "=" in raw_value and len(raw_value) < 100) or \
-               (secret_key in ["DOCKERHUB_USERNAME"] and not "=" in raw_value):
-                env_secrets[secret_key] = raw_value
-            else:
-                # Decode base64 encoded values
-                env_secrets[secret_key] = _decode_b64(raw_value)
-        else:
-            env_secrets[secret_key] = None
-    return env_secrets
+            raw_secrets[secret_key] = raw_value.strip('"\'')
+    return raw_secrets
+
+
+def _decode_env_secret(secret_key: str, raw_value: str) -> str:
+    """Decode an environment secret unless it already looks decoded."""
+    # Check if value is already decoded, use as-is; otherwise decode it
+    if (secret_key == "TF_API_KEY" and ".atlasv1." in raw_value) or \
+       (secret_key == "GITHUB_TOKEN" and raw_value.startswith("ghp_")) or \
+       (secret_key == "OPENAI_API_KEY" and raw_value.startswith("sk-")) or \
+       (secret_key == "ANTHROPIC_API_KEY" and raw_value.startswith("sk-ant-")) or \
+       (secret_key == "GOOGLE_API_KEY" and not "=" in raw_value and len(raw_value) < 100) or \
+       (secret_key in ["DOCKERHUB_USERNAME"] and not "=" in raw_value):
+        return raw_value
+    # Decode base64 encoded values
+    return _decode_b64(raw_value)
+
+
+def _get_env_secrets() -> Dict[str, Optional[str]]:
+    """Get secrets from environment variables."""
+    raw_secrets = _raw_env_secrets()
+    return {
+        secret_key: _decode_env_secret(secret_key, raw_secrets[secret_key]) if secret_key in raw_secrets else None
+        for secret_key in EXPECTED_SECRETS
+    }
 
 
 def _load_secrets_from_file() -> Dict[str, str]:
@@ -173,6 +193,201 @@ def _load_secrets_from_file() -> Dict[str, str]:
         return {}
 
 
+# Environment names that resolve to a secret under another name
+SECRET_ALIASES = {
+    **{env_name: secret_key for secret_key, env_name in SECRET_ENV_MAPPING.items()},
+    **{alt_name: "TF_API_KEY" for alt_name in TFE_TOKEN_ALTERNATIVES},
+}
+
+
+class SecretSnapshot(Mapping):
+    """
+    Immutable view of the secrets from one source at one point in time.
+
+    Holds the raw (encoded) values and decodes each one on first access only;
+    the decoded value is memoized, so later reads are plain dictionary lookups.
+    stamp identifies the secrets file state (mtime and size) it was read from;
+    file_keys are the entries of an environment snapshot that a rotated
+    secrets file overrides.
+    """
+
+    __slots__ = ("source", "stamp", "_raw", "_decoded", "_file_keys")
+
+    def __init__(self, raw: Dict[str, str], source: Optional[str], stamp=None, file_keys=()):
+        self.source = source
+        self.stamp = stamp
+        self._raw = dict(raw)
+        self._decoded = {}
+        self._file_keys = frozenset(file_keys)
+
+    def source_of(self, secret_key: str) -> Optional[str]:
+        """Where one secret came from: "environment" or "file"."""
+        return "file" if secret_key in self._file_keys else self.source
+
+    def __getitem__(self, secret_key: str) -> str:
+        try:
+            return self._decoded[secret_key]
+        except KeyError:
+            pass
+        raw_value = self._raw[secret_key]
+        if self.source_of(secret_key) == "file":
+            value = _decode_b64(str(raw_value))
+        else:
+            value = _decode_env_secret(secret_key, raw_value)
+        self._decoded[secret_key] = value
+        return value
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def __repr__(self) -> str:
+        # Never show values
+        return f"SecretSnapshot(source={self.source!r}, secrets={sorted(self._raw)})"
+
+
+def _file_stamp():
+    """(mtime_ns, size) of the secrets file, or None if it does not exist."""
+    try:
+        stat = _YAML_PATH.stat()
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+# Values load_secrets() exported from the file; they are not environment secrets
+_exported_from_file = {}
+
+# The secrets file as the process found it; once it changes, it is a rotation
+_startup_stamp = _file_stamp()
+
+
+def _build_snapshot(stamp) -> SecretSnapshot:
+    """
+    Read secrets the way load_secrets() picks them: environment first, then the file.
+
+    The environment only wins over the file the process started with: once
+    the file changes (or appears), its entries are rotations and override the
+    environment values they name.
+    """
+    raw_secrets = {
+        secret_key: raw_value for secret_key, raw_value in _raw_env_secrets().items()
+        if _exported_from_file.get(secret_key) != raw_value
+    }
+    if raw_secrets:
+        rotated = {}
+        if stamp is not None and stamp != _startup_stamp:
+            rotated = _load_secrets_from_file()
+        return SecretSnapshot({**raw_secrets, **rotated}, "environment", stamp, file_keys=rotated)
+    if stamp is not None and _is_dev_environment():
+        return SecretSnapshot(_load_secrets_from_file(), "file", stamp)
+    return SecretSnapshot({}, None, stamp)
+
+
+# Seconds between checks of the secrets file for changes
+try:
+    SECRETS_CHECK_INTERVAL = float(os.environ.get("SECRETS_CHECK_INTERVAL", 1.0))
+except ValueError:
+    SECRETS_CHECK_INTERVAL = 1.0
+
+_snapshot = None
+_snapshot_checked_at = 0.0
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot() -> SecretSnapshot:
+    """
+    Memoized SecretSnapshot, rebuilt when the secrets file's mtime or size changes.
+
+    The file is stat'ed at most every SECRETS_CHECK_INTERVAL seconds (default 1),
+    so calls in between cost a clock read and a lookup.
+    """
+    global _snapshot, _snapshot_checked_at
+    snapshot = _snapshot
+    now = time.monotonic()
+    if snapshot is not None and now - _snapshot_checked_at < SECRETS_CHECK_INTERVAL:
+        return snapshot
+    with _snapshot_lock:
+        stamp = _file_stamp()
+        if _snapshot is None or _snapshot.stamp != stamp:
+            _snapshot = _build_snapshot(stamp)
+        _snapshot_checked_at = now
+        return _snapshot
+
+
+def invalidate_secrets() -> None:
+    """Drop the memoized snapshot, e.g. after changing secret environment variables."""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
+
+
+def get_secret(name: str, default: Optional[str] = None) -> Optional[str]:
+    """
+    Decoded value of one secret, without loading or exporting the others.
+
+    Accepts secret names (TF_API_KEY) and the environment names they are
+    exported as (TFE_TOKEN, TF_TOKEN_app_terraform_io).
+    """
+    return get_snapshot().get(SECRET_ALIASES.get(name, name), default)
+
+
+# Raw values last exported to os.environ, to find what a rotation changed
+_applied_raw = {}
+
+
+def _export_secret(secret_key: str, value: Optional[str], source: Optional[str]) -> None:
+    """Set (or, for None, unset) the environment variables of one secret."""
+    env_names = [SECRET_ENV_MAPPING.get(secret_key, secret_key)]
+    if secret_key == "TF_API_KEY":
+        env_names.append("TF_TOKEN_app_terraform_io")
+    for env_name in env_names:
+        if value:
+            os.environ[env_name] = value
+        elif _exported_from_file.get(secret_key) is not None:
+            # Only unset what the file put there
+            os.environ.pop(env_name, None)
+    if source == "file" and value:
+        _exported_from_file[secret_key] = value
+    else:
+        _exported_from_file.pop(secret_key, None)
+
+
+def refresh_secrets(apply: bool = True) -> Dict[str, Optional[str]]:
+    """
+    Re-read the secrets now and apply only the ones that changed.
+
+    apply=False only records the current secrets as applied, without
+    exporting anything: a baseline later calls compare against.
+
+    Entries whose raw value matches what was last applied are left alone and
+    not decoded again; changed ones are decoded and exported to os.environ
+    (removed ones unset, if they came from the file). The environment keeps
+    precedence over the file the process started with, as in load_secrets(),
+    but entries of a changed file override it.
+
+    Returns:
+        The changed secrets by name, with None for removed ones
+    """
+    global _snapshot, _snapshot_checked_at, _applied_raw
+    with _snapshot_lock:
+        snapshot = _build_snapshot(_file_stamp())
+        _snapshot, _snapshot_checked_at = snapshot, time.monotonic()
+        previous, _applied_raw = _applied_raw, dict(snapshot._raw)
+        if not apply:
+            return {}
+        changed = {
+            secret_key: snapshot[secret_key] if secret_key in snapshot else None
+            for secret_key in set(previous) | set(snapshot._raw)
+            if previous.get(secret_key) != snapshot._raw.get(secret_key)
+        }
+        for secret_key, value in changed.items():
+            _export_secret(secret_key, value, snapshot.source_of(secret_key))
+    return changed
+
+
 def _validate_and_set_secrets(secrets: Dict[str, str], source: str = "environment") -> None:
     """Validate secrets and set them as environment variables."""
     missing_required = []
@@ -193,18 +408,15 @@ def _validate_and_set_secrets(secrets: Dict[str, str], source: str = "environmen
             empty_secrets.append(secret_key)
             continue
             
-        # Set environment variable (decode only if from file, not if already from env)
+        # Set environment variable (values arrive decoded from the snapshot)
         try:
-            if source == "file":
-                # File values need to be decoded
-                decoded_value = _decode_b64(secret_value)
-            else:
-                # Environment values are already decoded by _get_env_secrets()
-                decoded_value = secret_value
-                
+            decoded_value = secret_value
+            
             if decoded_value:
                 os.environ[env_name] = decoded_value
                 loaded_secrets.append(env_name)
+                if source == "file":
+                    _exported_from_file[secret_key] = decoded_value
                 
                 # Special handling for TF_API_KEY - also set TF_TOKEN_app_terraform_io
                 if secret_key == "TF_API_KEY":
@@ -267,6 +479,9 @@ def load_secrets() -> None:
     """
     Load and validate secrets from environment variables or secrets.yaml file.
     
+    Compatibility wrapper around get_snapshot(): use get_secret(name) to read
+    a single secret without exporting everything to os.environ.
+    
     Workflow:
     1. Check if secrets are available in environment variables
     2. If any env secrets exist but are empty, halt execution with error
@@ -278,24 +493,24 @@ def load_secrets() -> None:
     """
     print("🔐 Loading and validating secrets...")
     
-    # First, check environment variables
-    env_secrets = _get_env_secrets()
-    env_secrets_present = any(v is not None for v in env_secrets.values())
+    global _applied_raw
+    
+    # Parsing and decoding happen once per snapshot, not on every call
+    snapshot = get_snapshot()
+    _applied_raw = dict(snapshot._raw)
     
-    if env_secrets_present:
+    if snapshot.source == "environment":
         # Environment variables are present, validate them
         print("🔍 Found secrets in environment variables")
-        valid_env_secrets = {k: v for k, v in env_secrets.items() if v is not None}
-        _validate_and_set_secrets(valid_env_secrets, "environment")
+        _validate_and_set_secrets(dict(snapshot), "environment")
         return
     
     # No environment secrets found
     if _is_dev_environment():
         print("🔍 No environment secrets found, checking secrets file...")
-        file_secrets = _load_secrets_from_file()
-        if file_secrets:
+        if snapshot.source == "file" and snapshot:
             print(f"📁 Loading secrets from {_YAML_PATH}")
-            _validate_and_set_secrets(file_secrets, "file")
+            _validate_and_set_secrets(dict(snapshot), "file")
             return
         else:
             print(f"❌ No secrets found in {_YAML_PATH}")
@@ -342,11 +557,174 @@ def export_secrets_to_bash(output_file: str) -> None:
     print(f'✅ {exported_count} environment variables exported to {output_file}')
 
 
+# Default secrets store edited by update_secrets.sh (relative to the repo root)
+SECRETS_STORE = "envs/config/secrets.yaml"
+
+# One "key: value" line of secrets.yaml. The key ends at the first colon, so
+# values may contain colons; a " #" starts a trailing comment as in YAML.
+_YAML_ENTRY = re.compile(
+    r"^(?P<indent>[ \t]*)(?P<key>[^#\s:][^:]*?)[ \t]*:(?P<space>[ \t]*)"
+    r"(?P<value>.*?)(?P<comment>[ \t]+#.*)?$"
+)
+
+# Canonical, padded base64 (what `base64` and b64encode produce)
+_B64 = re.compile(r"(?:[A-Za-z0-9+/]{4})*(?:[A-Za-z0-9+/]{2}==|[A-Za-z0-9+/]{3}=)?")
+
+# YAML values that are not plain scalars (blocks, flow collections, anchors, tags)
+_NON_SCALAR_PREFIXES = ("|", ">", "[", "{", "&", "*", "!")
+
+
+def _is_b64(value: str) -> bool:
+    """Whether value is canonical base64 of UTF-8 text (round-trips exactly)."""
+    if not value or not _B64.fullmatch(value):
+        return False
+    try:
+        raw = base64.b64decode(value, validate=True)
+        raw.decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError):
+        return False
+    return base64.b64encode(raw).decode("ascii") == value
+
+
+def _needs_quotes(value: str) -> bool:
+    """Whether a plain YAML scalar would not read back as value."""
+    return (
+        ": " in value or " #" in value or value.endswith(":") or value != value.strip()
+        or value[:1] in "'\"#&*!|>[]{},%@`" or value.startswith(("- ", "? "))
+    )
+
+
+def _unquote(inner: str, quote: str) -> str:
+    if quote == '"':
+        return inner.replace('\\"', '"').replace("\\\\", "\\")
+    return inner.replace("''", "'")
+
+
+def _quote(inner: str, quote: str) -> str:
+    if quote == '"':
+        return inner.replace("\\", "\\\\").replace('"', '\\"')
+    if quote == "'":
+        return inner.replace("'", "''")
+    return inner
+
+
+def _transform_value(mode: str, value: str):
+    """(new value, status) for one secret value; status is changed/unchanged/raw/encoded."""
+    encoded = _is_b64(value)
+    if mode == "encode":
+        if encoded:
+            return value, "unchanged"
+        return base64.b64encode(value.encode("utf-8")).decode("ascii"), "changed"
+    if mode == "decode":
+        if not encoded:
+            return value, "unchanged"
+        return _decode_b64(value), "changed"
+    return value, "encoded" if encoded else "raw"
+
+
+def transform_secrets_text(text: str, mode: str):
+    """
+    Encode, decode or verify every value of a secrets.yaml document.
+
+    Works line by line, so comments, blank lines, ordering, indentation,
+    quoting and trailing comments stay exactly as they were; only the values
+    change. Already encoded values are not encoded again, and plain values
+    are not "decoded".
+
+    Args:
+        text: The file content
+        mode: "encode", "decode" or "verify"
+
+    Returns:
+        (new text, {key: status}) where status is "changed"/"unchanged"
+        (encode, decode) or "encoded"/"raw" (verify)
+    """
+    lines = text.splitlines(keepends=True)
+    statuses = {}
+    for i, line in enumerate(lines):
+        body = line.rstrip("\r\n")
+        match = _YAML_ENTRY.match(body)
+        if not match or not match.group("value") or match.group("value").startswith(_NON_SCALAR_PREFIXES):
+            continue
+        value = match.group("value")
+        quote = value[0] if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"" else ""
+        inner = _unquote(value[1:-1], quote) if quote else value
+        new_inner, status = _transform_value(mode, inner)
+        statuses[match.group("key")] = status
+        if new_inner != inner:
+            if not quote and _needs_quotes(new_inner):
+                # A decoded value that plain YAML would misread gets quoted
+                quote = '"'
+            new_inner = _quote(new_inner, quote)
+            lines[i] = (
+                f"{match.group('indent')}{match.group('key')}:{match.group('space') or ' '}"
+                f"{quote}{new_inner}{quote}{match.group('comment') or ''}{line[len(body):]}"
+            )
+    return "".join(lines), statuses
+
+
+def transform_secrets_file(path: str, mode: str, dry_run: bool = False) -> Dict[str, str]:
+    """Apply transform_secrets_text() to a file, replacing it atomically unless dry_run."""
+    source = pathlib.Path(path)
+    text = source.read_text(encoding="utf-8")
+    new_text, statuses = transform_secrets_text(text, mode)
+    if new_text != text and not dry_run:
+        fd, tmp_path = tempfile.mkstemp(dir=source.parent, prefix=f".{source.name}.")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(new_text)
+            os.chmod(tmp_path, source.stat().st_mode & 0o777)
+            os.replace(tmp_path, source)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return statuses
+
+
+def secrets_store_cli(argv: List[str]) -> int:
+    """`sec_utils.py encode|decode|verify [FILE...]`; returns the exit code."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(
+        prog="sec_utils.py",
+        description="Base64-encode, decode or verify every value of secrets.yaml files in place.",
+    )
+    parser.add_argument("mode", choices=["encode", "decode", "verify"])
+    parser.add_argument("files", nargs="*", default=[SECRETS_STORE],
+                        help=f"secrets files (default: {SECRETS_STORE})")
+    parser.add_argument("--dry-run", action="store_true", help="report without writing")
+    args = parser.parse_args(argv)
+    
+    exit_code = 0
+    for path in args.files:
+        try:
+            statuses = transform_secrets_file(path, args.mode, args.dry_run)
+        except OSError as e:
+            print(f"❌ {path}: {e}")
+            exit_code = 1
+            continue
+        if args.mode == "verify":
+            raw = [key for key, status in statuses.items() if status == "raw"]
+            if raw:
+                print(f"❌ {path}: {len(raw)} value(s) not base64-encoded: {', '.join(raw)}")
+                exit_code = 1
+            else:
+                print(f"✅ {path}: all {len(statuses)} values are base64-encoded")
+        else:
+            changed = sum(status == "changed" for status in statuses.values())
+            action = "would be " if args.dry_run else ""
+            print(f"✅ {path}: {changed} of {len(statuses)} values {action}{args.mode}d")
+    return exit_code
+
+
 if __name__ == '__main__':
     """Command-line interface for sec_utils."""
     import sys
     
-    if len(sys.argv) == 1:
+    if len(sys.argv) >= 2 and sys.argv[1] in ("encode", "decode", "verify"):
+        # Edit the encoded secrets store in place
+        sys.exit(secrets_store_cli(sys.argv[1:]))
+    elif len(sys.argv) == 1:
         # No arguments - just load secrets
         load_secrets()
     elif len(sys.argv) == 2:
@@ -358,4 +736,5 @@ if __name__ == '__main__':
         print("Usage:")
         print("  python3 sec_utils.py                    # Load secrets only")
         print("  python3 sec_utils.py <output_file>      # Load secrets and export to bash file")
+        print("  python3 sec_utils.py encode|decode|verify [FILE...]  # Edit secrets.yaml values in place")
         sys.exit(1)
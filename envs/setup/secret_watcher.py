@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Hot reload of rotated secrets for long-running processes.
+
+Watches the secrets file (/run/secrets.yaml, or SECRETS_FILE) with inotify
+on Linux, or by polling its mtime and size elsewhere, and applies rotations
+through sec_utils.refresh_secrets(): only the changed entries are decoded
+and exported to os.environ, and subscribers are called with them. Entries of
+the changed file override the environment the process started with, so
+keys first passed through env_file can be rotated by the file too. In a
+container, mount the file's directory rather than the file: a single-file
+bind mount keeps the original inode, so a file replaced by rename (as most
+editors and sec_utils' own tools write it) is never seen.
+
+Clients from client_pool pick up the new credential on their next
+get_client() call; the old client finishes the requests it has in flight on
+the same connection pool, so nothing is dropped and nothing restarts.
+
+Usage:
+  from secret_watcher import start_watcher
+  start_watcher().subscribe(lambda changed: print(sorted(changed)))
+
+  python3 secret_watcher.py          # print the names of rotated secrets
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import threading
+import time
+
+import sec_utils
+
+# inotify(7) events that can mean the file changed, including atomic
+# replacement by rename and Kubernetes-style symlink swaps
+_IN_EVENTS = (
+    0x00000002    # IN_MODIFY
+    | 0x00000004  # IN_ATTRIB
+    | 0x00000008  # IN_CLOSE_WRITE
+    | 0x00000040  # IN_MOVED_FROM
+    | 0x00000080  # IN_MOVED_TO
+    | 0x00000100  # IN_CREATE
+    | 0x00000200  # IN_DELETE
+)
+
+
+class _Inotify:
+    """Minimal inotify watch on a directory via libc; raises OSError if unavailable."""
+
+    def __init__(self, directory: str):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), _IN_EVENTS) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"cannot watch {directory}")
+
+    def wait(self, timeout: float) -> bool:
+        """Block until something changes in the directory (True) or timeout (False)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class SecretWatcher:
+    """
+    Background thread applying secret rotations as they happen.
+
+    With inotify the file's directory is watched and changes apply almost
+    immediately; without it the file is checked every interval seconds
+    (SECRETS_WATCH_INTERVAL, default 5). The file is also re-checked every
+    interval with inotify, in case an event was missed.
+    """
+
+    def __init__(self, interval: float = None, debounce: float = 0.1):
+        # The file sec_utils reads secrets from
+        self.path = str(sec_utils._YAML_PATH)
+        self.interval = interval or float(os.environ.get("SECRETS_WATCH_INTERVAL", 5))
+        self.debounce = debounce
+        self.mode = None
+        self.rotations = 0
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        """Call callback(changed) after each rotation; changed maps names to new values (None: removed)."""
+        with self._lock:
+            self._callbacks.append(callback)
+        return callback
+
+    def unsubscribe(self, callback) -> None:
+        with self._lock:
+            self._callbacks.remove(callback)
+
+    def check(self) -> dict:
+        """Apply any change now and notify subscribers; returns the changed secrets."""
+        changed = sec_utils.refresh_secrets()
+        if changed:
+            self.rotations += 1
+            with self._lock:
+                callbacks = list(self._callbacks)
+            for callback in callbacks:
+                try:
+                    callback(changed)
+                except Exception as e:
+                    print(f"❌ Secret watcher callback error: {e}")
+        return changed
+
+    def start(self) -> "SecretWatcher":
+        # Baseline: whatever is current now is not a rotation, and is left
+        # where the process already reads it from rather than exported
+        sec_utils.refresh_secrets(apply=False)
+        self._thread = threading.Thread(target=self._run, name="secret-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        try:
+            inotify = _Inotify(os.path.dirname(self.path) or ".")
+            self.mode = "inotify"
+        except OSError:
+            inotify = None
+            self.mode = "polling"
+        try:
+            while not self._stop.is_set():
+                if inotify is not None:
+                    if inotify.wait(self.interval) and self.debounce:
+                        # Let writers that rewrite the file in steps finish
+                        self._stop.wait(self.debounce)
+                else:
+                    self._stop.wait(self.interval)
+                if not self._stop.is_set():
+                    self.check()
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def start_watcher(interval: float = None) -> SecretWatcher:
+    """Start the process-wide watcher (once) and return it."""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = SecretWatcher(interval).start()
+        return _watcher
+
+
+def main():
+    watcher = start_watcher()
+    watcher.subscribe(lambda changed: print(f"🔄 Secrets rotated: {', '.join(sorted(changed))}"))
+    time.sleep(0.1)
+    print(f"👀 Watching {watcher.path} ({watcher.mode or 'starting'})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("👋 Secret watcher stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+"""
+Semantic cache of model answers, backed by Qdrant.
+
+A question is embedded and looked up among the questions answered before in
+the same namespace and conversation context; if the nearest one is at least
+SEMANTIC_CACHE_THRESHOLD (cosine, default 0.9) similar, its answer is reused
+and the model is not called. Entries expire after SEMANTIC_CACHE_TTL seconds
+(3600), and each namespace keeps about SEMANTIC_CACHE_MAX_ENTRIES (10000),
+oldest evicted first: eviction runs once every SEMANTIC_CACHE_EVICT_EVERY
+(100) stores of a namespace rather than on each one, and lookups skip
+expired entries in between. Hits, misses, stores, evictions and errors are
+counted per namespace; a failing cache only costs a miss.
+
+Backends (SEMANTIC_CACHE_BACKEND):
+- qdrant: the stack's Qdrant at QDRANT_URL (http://qdrant:6333) over its
+  REST API, on the pooled HTTP client (QDRANT_API_KEY if it needs a key);
+- memory: an in-process brute-force index standing in for Qdrant in tests.
+
+Embedders (SEMANTIC_CACHE_EMBEDDER):
+- openai: SEMANTIC_CACHE_EMBED_MODEL (text-embedding-3-small), the default
+  when OPENAI_API_KEY is set;
+- hash: hashed words and character trigrams, offline and deterministic; it
+  catches rewordings of case, punctuation and word order, not synonyms.
+
+Each embedder gets its own collection, so vectors of different models are
+never compared.
+
+Usage:
+    from semantic_cache import get_cache
+    answer, vector = await get_cache().lookup("agent", question)
+    if answer is None:
+        answer = ...
+        # The lookup's embedding, so a miss embeds the question only once
+        await get_cache().store("agent", question, answer, vector=vector)
+"""
+
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+import uuid
+
+from api_utils import get_timeout, prometheus_label
+
+_WORD = re.compile(r"\w+")
+
+
+def context_key(chat: list) -> str:
+    """Fingerprint of the conversation before the question (role/content dicts)."""
+    digest = hashlib.sha256()
+    for message in chat:
+        digest.update(f"{message['role']}\0{message['content']}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _normalize(vector: list) -> list:
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else vector
+
+
+class HashEmbedder:
+    """Feature hashing of words and character trigrams into dim signed buckets."""
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hash{dim}"
+
+    def _features(self, text: str):
+        words = _WORD.findall(text.lower())
+        yield from words
+        joined = f" {' '.join(words)} "
+        yield from (joined[i:i + 3] for i in range(len(joined) - 2))
+
+    async def embed(self, text: str) -> list:
+        vector = [0.0] * self.dim
+        for feature in self._features(text):
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[h % self.dim] += 1.0 if (h >> 63) else -1.0
+        return _normalize(vector)
+
+
+class OpenAIEmbedder:
+    """OpenAI embeddings through the pooled client, within the provider's rate limits."""
+
+    def __init__(self, model: str = None):
+        self.model = model or os.environ.get("SEMANTIC_CACHE_EMBED_MODEL", "text-embedding-3-small")
+        self.name = f"openai-{self.model}"
+
+    async def embed(self, text: str) -> list:
+        # Imported here: only this embedder needs the SDK and the pool
+        from client_pool import get_pool
+        from rate_limit import RetryScheduler, get_limiter
+
+        client = get_pool().get_async_client("openai").with_options(max_retries=0, timeout=10)
+        response = await RetryScheduler(get_limiter("openai"), max_attempts=2).acall(
+            client.embeddings.create, model=self.model, input=text
+        )
+        return _normalize(response.data[0].embedding)
+
+
+class MemoryIndex:
+    """In-process vector index with the QdrantIndex interface, for tests and offline use."""
+
+    def __init__(self):
+        self.collections = {}   # collection -> {point id: (vector, payload)}
+
+    async def ensure(self, collection: str, dim: int) -> None:
+        self.collections.setdefault(collection, {})
+
+    async def search(self, collection: str, vector: list, match: dict, min_score: float, now: float):
+        """Best (score, payload) among live points matching every match field, or None."""
+        best = None
+        for point, payload in self.collections.get(collection, {}).values():
+            if payload["expires_at"] <= now or any(payload.get(k) != v for k, v in match.items()):
+                continue
+            score = sum(a * b for a, b in zip(vector, point))
+            if score >= min_score and (best is None or score > best[0]):
+                best = (score, payload)
+        return best
+
+    async def upsert(self, collection: str, point_id: str, vector: list, payload: dict) -> None:
+        self.collections.setdefault(collection, {})[point_id] = (vector, payload)
+
+    async def evict(self, collection: str, namespace: str, keep: int, now: float) -> int:
+        """Drop the namespace's expired points, then its oldest beyond keep; returns how many."""
+        points = self.collections.get(collection, {})
+        mine = sorted(
+            (payload["created_at"], point_id, payload["expires_at"])
+            for point_id, (_, payload) in points.items() if payload["namespace"] == namespace
+        )
+        expired = [point_id for _, point_id, expires_at in mine if expires_at <= now]
+        live = [point_id for _, point_id, expires_at in mine if expires_at > now]
+        doomed = expired + (live[:len(live) - keep] if keep and len(live) > keep else [])
+        for point_id in doomed:
+            del points[point_id]
+        return len(doomed)
+
+    async def clear(self, collection: str, namespace: str) -> int:
+        points = self.collections.get(collection, {})
+        doomed = [point_id for point_id, (_, payload) in points.items() if payload["namespace"] == namespace]
+        for point_id in doomed:
+            del points[point_id]
+        return len(doomed)
+
+
+class QdrantIndex:
+    """Qdrant collections over the REST API; namespaces are a payload field."""
+
+    def __init__(self, url: str = None, api_key: str = None):
+        self.url = (url or os.environ.get("QDRANT_URL") or "http://qdrant:6333").rstrip("/")
+        api_key = api_key or os.environ.get("QDRANT_API_KEY")
+        self.headers = {"api-key": api_key} if api_key else {}
+        self.timeout = get_timeout("SEMANTIC_CACHE_TIMEOUT", 5)
+        self._ready = set()
+
+    async def _call(self, method: str, path: str, json: dict = None, allow=()) -> dict:
+        from client_pool import get_pool
+
+        response = await get_pool().async_http_client().request(
+            method, f"{self.url}{path}", json=json, headers=self.headers, timeout=self.timeout
+        )
+        if response.status_code in allow:
+            return {}
+        response.raise_for_status()
+        return response.json().get("result") or {}
+
+    async def ensure(self, collection: str, dim: int) -> None:
+        if collection in self._ready:
+            return
+        if not await self._call("GET", f"/collections/{collection}", allow=(404,)):
+            await self._call("PUT", f"/collections/{collection}",
+                             {"vectors": {"size": dim, "distance": "Cosine"}}, allow=(409,))
+            # Filtered search and ordered eviction need payload indexes
+            for field, schema in (("namespace", "keyword"), ("context", "keyword"),
+                                  ("expires_at", "float"), ("created_at", "float")):
+                await self._call("PUT", f"/collections/{collection}/index?wait=true",
+                                 {"field_name": field, "field_schema": schema})
+        self._ready.add(collection)
+
+    @staticmethod
+    def _filter(match: dict, expired: bool = None, now: float = None) -> dict:
+        must = [{"key": key, "match": {"value": value}} for key, value in match.items()]
+        if expired is not None:
+            must.append({"key": "expires_at", "range": {"lte" if expired else "gt": now}})
+        return {"must": must}
+
+    async def search(self, collection: str, vector: list, match: dict, min_score: float, now: float):
+        hits = await self._call("POST", f"/collections/{collection}/points/search", {
+            "vector": vector, "limit": 1, "score_threshold": min_score, "with_payload": True,
+            "filter": self._filter(match, expired=False, now=now),
+        })
+        return (hits[0]["score"], hits[0]["payload"]) if hits else None
+
+    async def upsert(self, collection: str, point_id: str, vector: list, payload: dict) -> None:
+        await self._call("PUT", f"/collections/{collection}/points?wait=true",
+                         {"points": [{"id": point_id, "vector": vector, "payload": payload}]})
+
+    async def _count(self, collection: str, query: dict) -> int:
+        result = await self._call("POST", f"/collections/{collection}/points/count",
+                                  {"filter": query, "exact": True})
+        return result.get("count", 0)
+
+    async def _delete(self, collection: str, selector: dict) -> None:
+        await self._call("POST", f"/collections/{collection}/points/delete?wait=true", selector)
+
+    async def evict(self, collection: str, namespace: str, keep: int, now: float) -> int:
+        expired = self._filter({"namespace": namespace}, expired=True, now=now)
+        evicted = await self._count(collection, expired)
+        if evicted:
+            await self._delete(collection, {"filter": expired})
+        if keep:
+            excess = await self._count(collection, self._filter({"namespace": namespace})) - keep
+            if excess > 0:
+                oldest = await self._call("POST", f"/collections/{collection}/points/scroll", {
+                    "filter": self._filter({"namespace": namespace}), "limit": excess,
+                    "order_by": {"key": "created_at", "direction": "asc"},
+                    "with_payload": False, "with_vector": False,
+                })
+                ids = [point["id"] for point in oldest.get("points", [])]
+                if ids:
+                    await self._delete(collection, {"points": ids})
+                evicted += len(ids)
+        return evicted
+
+    async def clear(self, collection: str, namespace: str) -> int:
+        query = self._filter({"namespace": namespace})
+        cleared = await self._count(collection, query)
+        if cleared:
+            await self._delete(collection, {"filter": query})
+        return cleared
+
+
+class SemanticCache:
+    """
+    Answers looked up by question similarity, per namespace and context.
+
+    Shared by every task in the process; the counters are exported by stats()
+    and format_prometheus().
+    """
+
+    COUNTERS = ("hits", "misses", "stores", "evictions", "errors")
+
+    def __init__(self, index=None, embedder=None, threshold: float = None, ttl: float = None,
+                 max_entries: int = None, collection: str = None, evict_every: int = None):
+        self.index = index or MemoryIndex()
+        self.embedder = embedder or HashEmbedder()
+        self.threshold = threshold or float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.9))
+        self.ttl = ttl or get_timeout("SEMANTIC_CACHE_TTL", 3600)
+        self.max_entries = get_timeout("SEMANTIC_CACHE_MAX_ENTRIES", 10000) if max_entries is None else max_entries
+        self.evict_every = evict_every or get_timeout("SEMANTIC_CACHE_EVICT_EVERY", 100)
+        prefix = collection or os.environ.get("SEMANTIC_CACHE_COLLECTION", "semantic_cache")
+        self.collection = re.sub(r"[^A-Za-z0-9_-]", "_", f"{prefix}_{self.embedder.name}")
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._stores_since_evict = {}
+
+    def _count(self, namespace: str, counter: str, amount: float = 1) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(namespace, dict.fromkeys(self.COUNTERS + ("lookup_seconds",), 0))
+            stats[counter] += amount
+
+    async def _embed(self, text: str) -> list:
+        vector = await self.embedder.embed(text)
+        await self.index.ensure(self.collection, len(vector))
+        return vector
+
+    async def lookup(self, namespace: str, question: str, context: str = "") -> tuple:
+        """
+        (cached answer to question or a question like it, or None; the question's vector).
+
+        Pass the vector to store() on a miss so the question is not embedded
+        again; it is None if embedding failed.
+        """
+        started = time.monotonic()
+        vector = None
+        try:
+            vector = await self._embed(question)
+            hit = await self.index.search(self.collection, vector, {"namespace": namespace, "context": context},
+                                          self.threshold, time.time())
+        except Exception as e:
+            print(f"❌ Semantic cache lookup failed: {e}")
+            self._count(namespace, "errors")
+            hit = None
+        self._count(namespace, "lookup_seconds", time.monotonic() - started)
+        self._count(namespace, "hits" if hit else "misses")
+        return (hit[1]["answer"] if hit else None), vector
+
+    def _evict_due(self, namespace: str) -> bool:
+        with self._lock:
+            stores = self._stores_since_evict.get(namespace, 0) + 1
+            self._stores_since_evict[namespace] = 0 if stores >= self.evict_every else stores
+            return stores >= self.evict_every
+
+    async def store(self, namespace: str, question: str, answer: str, context: str = "",
+                    vector: list = None) -> None:
+        """
+        Cache answer for question (embedded unless its vector from lookup() is given).
+
+        Every evict_every stores of a namespace, its expired and excess
+        entries are evicted.
+        """
+        now = time.time()
+        try:
+            if vector is None:
+                vector = await self._embed(question)
+            await self.index.upsert(self.collection, str(uuid.uuid4()), vector, {
+                "namespace": namespace, "context": context, "question": question, "answer": answer,
+                "created_at": now, "expires_at": now + self.ttl,
+            })
+            self._count(namespace, "stores")
+            if self._evict_due(namespace):
+                self._count(namespace, "evictions", await self.index.evict(self.collection, namespace,
+                                                                           self.max_entries, now))
+        except Exception as e:
+            print(f"❌ Semantic cache store failed: {e}")
+            self._count(namespace, "errors")
+
+    async def clear(self, namespace: str) -> int:
+        """Evict every entry of a namespace; returns how many there were."""
+        cleared = await self.index.clear(self.collection, namespace)
+        self._count(namespace, "evictions", cleared)
+        return cleared
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {namespace: dict(values) for namespace, values in self._stats.items()}
+
+    def format_prometheus(self) -> str:
+        """Cache metrics in the Prometheus text exposition format."""
+        metrics = [
+            ("semantic_cache_hits_total", "hits", "Lookups answered from the cache."),
+            ("semantic_cache_misses_total", "misses", "Lookups that found no similar question."),
+            ("semantic_cache_stores_total", "stores", "Answers added to the cache."),
+            ("semantic_cache_evictions_total", "evictions", "Entries removed as expired, excess or cleared."),
+            ("semantic_cache_errors_total", "errors", "Failed lookups and stores."),
+            ("semantic_cache_lookup_seconds_total", "lookup_seconds", "Time spent in lookups."),
+        ]
+        stats = self.stats()
+        lines = []
+        for metric, key, description in metrics:
+            lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+            for namespace, values in stats.items():
+                lines.append(f'{metric}{{namespace="{prometheus_label(namespace)}"}} {values[key]}')
+        return "\n".join(lines) + "\n"
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> SemanticCache:
+    """The process-wide SemanticCache, configured from the environment on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            backend = os.environ.get("SEMANTIC_CACHE_BACKEND", "qdrant")
+            default_embedder = "openai" if os.environ.get("OPENAI_API_KEY") else "hash"
+            embedder = os.environ.get("SEMANTIC_CACHE_EMBEDDER", default_embedder)
+            _cache = SemanticCache(
+                index=QdrantIndex() if backend == "qdrant" else MemoryIndex(),
+                embedder=OpenAIEmbedder() if embedder == "openai" else HashEmbedder(),
+            )
+        return _cache
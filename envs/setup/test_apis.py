@@ -4,19 +4,84 @@ Test all API connections to verify they are working.
 This script is called by entrypoint.sh to validate API connectivity.
 """
 
+import argparse
+import contextlib
 import sys
-from api_utils import test_all_apis
+from api_utils import (
+    PROVIDER_SDKS,
+    format_jsonl,
+    format_prometheus,
+    probe_key,
+    sdk_import_report,
+    select_probes,
+    test_all_apis,
+)
+
+# Machine-readable output formats
+FORMATTERS = {
+    "json": format_jsonl,
+    "prometheus": format_prometheus,
+}
+
+def provider_list(value):
+    """Comma-separated provider keys, e.g. "openai,github"."""
+    return [key.strip() for key in value.split(",") if key.strip()]
+
+def print_import_report(probes):
+    """Import cost of api_utils and of the SDKs the selected probes would load."""
+    providers = [probe_key(name) for name, _ in probes if probe_key(name) in PROVIDER_SDKS]
+    print("📦 Import time (cumulative, -X importtime):")
+    for name, stats in sdk_import_report(providers).items():
+        if "error" in stats:
+            print(f"   {name}: {stats['error']}")
+        else:
+            print(f"   {name}: {stats['cumulative_ms']:.1f} ms ({stats['modules']} modules)")
 
 def main():
     """Test all API connections."""
+    parser = argparse.ArgumentParser(description="Test all API connections.")
+    parser.add_argument("--refresh", action="store_true",
+                        help="ignore cached probe results and re-probe every provider")
+    parser.add_argument("--format", choices=["text", *FORMATTERS], default="text",
+                        help="text (default), json (JSON lines) or prometheus (text exposition)")
+    parser.add_argument("--output", metavar="FILE",
+                        help="write json/prometheus results to FILE instead of stdout")
+    parser.add_argument("--only", type=provider_list, action="extend", metavar="PROVIDERS",
+                        help="probe only these providers (comma-separated, e.g. openai,github)")
+    parser.add_argument("--skip", type=provider_list, action="extend", metavar="PROVIDERS",
+                        help="do not probe these providers (comma-separated)")
+    parser.add_argument("--import-report", action="store_true",
+                        help="report the import time of api_utils and the selected providers' SDKs")
+    args = parser.parse_args()
+
     try:
-        print('🧪 Starting API connection tests...')
-        test_all_apis()
-        print('✅ All API tests completed')
+        probes = select_probes(args.only, args.skip)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Keep stdout clean for the exported results unless they go to a file
+    log = sys.stderr if args.format != "text" and not args.output else sys.stdout
+
+    try:
+        with contextlib.redirect_stdout(log):
+            print('🧪 Starting API connection tests...')
+            if args.import_report:
+                print_import_report(probes)
+            results = test_all_apis(refresh=args.refresh, probes=probes)
+            print('✅ All API tests completed')
     except Exception as e:
-        print(f'❌ Error testing APIs: {e}')
+        print(f'❌ Error testing APIs: {e}', file=log)
         # Don't exit with error - we want the container to start even if some APIs fail
         # sys.exit(1)
+        return
+
+    if args.format != "text":
+        exported = FORMATTERS[args.format](results)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(exported)
+        else:
+            sys.stdout.write(exported)
 
 if __name__ == '__main__':
     main()
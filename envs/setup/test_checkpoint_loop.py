@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Check that SQLCheckpointSaver.aput() never touches the database on the event loop.
+
+A thread is written one step at a time through aput() with the delta base
+check forced on every step (CHECKPOINT_VERIFY_BASE_SECONDS=0, as for a head
+older than a minute between chat turns). Every database connection the saver
+opens records the thread it was opened on; none may be the event loop's.
+The checkpoints are then read back to make sure the deltas still decode.
+
+Usage:
+  python3 test_checkpoint_loop.py --steps 50
+"""
+
+import argparse
+import asyncio
+import contextlib
+import sys
+import threading
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+
+from checkpoint_serde import MessageListCodec
+from checkpointer import SQLCheckpointSaver, SQLiteBackend
+
+
+class RecordingBackend(SQLiteBackend):
+    """SQLite backend remembering the threads that opened a connection."""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = set()
+
+    @contextlib.contextmanager
+    def connection(self):
+        self.threads.add(threading.get_ident())
+        with super().connection() as conn:
+            yield conn
+
+
+async def write_thread(saver: SQLCheckpointSaver, steps: int) -> tuple:
+    """Write checkpoints through aput(); returns (loop thread, last checkpoint id, connecting threads)."""
+    config = {"configurable": {"thread_id": "loop-check", "checkpoint_ns": ""}}
+    # setup() ran on this thread before the loop started; only the writes count
+    saver.backend.threads.clear()
+    messages = []
+    checkpoint = None
+    for step in range(steps):
+        messages.append(HumanMessage(f"question {step}", id=f"h-{step}") if step % 2 == 0
+                        else AIMessage(f"answer {step}", id=f"a-{step}"))
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"messages": list(messages)}
+        checkpoint["channel_versions"] = {"messages": str(step + 1)}
+        config = await saver.aput(config, checkpoint, {"step": step}, {"messages": str(step + 1)})
+    return threading.get_ident(), checkpoint["id"], set(saver.backend.threads)
+
+
+def run_check(steps: int) -> list:
+    """Problems found, empty if aput() stayed off the loop and the thread reads back."""
+    backend = RecordingBackend()
+    with SQLCheckpointSaver(backend, flush_ms=0) as saver:
+        saver.codec = MessageListCodec(saver.serde, verify_after=0)
+        loop_thread, checkpoint_id, threads = asyncio.run(write_thread(saver, steps))
+        problems = []
+        if loop_thread in threads:
+            problems.append("aput() opened a database connection on the event loop thread")
+        saved = saver.get_tuple({"configurable": {"thread_id": "loop-check", "checkpoint_ns": "",
+                                                  "checkpoint_id": checkpoint_id}})
+        if saved is None or len(saved.checkpoint["channel_values"]["messages"]) != steps:
+            problems.append("the last checkpoint does not hold every message")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that aput() keeps database work off the event loop.")
+    parser.add_argument("--steps", type=int, default=50, help="checkpoints to write")
+    args = parser.parse_args()
+
+    problems = run_check(args.steps)
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        sys.exit(1)
+    print(f"✅ {args.steps} aput() calls with base checks kept the database off the event loop")
+
+
+if __name__ == '__main__':
+    main()
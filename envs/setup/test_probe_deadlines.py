@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Check that every probe gives up within its own timeout against a stalled server.
+
+Every request is sent to the bench_probes mock with a stall rate of 1: the
+mock accepts the request and never answers. Each probe must still return,
+failed, within its per-probe timeout (API_TIMEOUT, GITHUB_TIMEOUT, ... all
+set to --timeout) plus --slack, well before the overall API_CHECK_BUDGET,
+so a hung provider can never hold up the others or the caller, and must
+report the failure as a timeout.
+
+Usage:
+  python3 test_probe_deadlines.py --timeout 2
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from bench_probes import BENCH_CREDENTIALS, start_mock
+
+TIMEOUT_VARS = ("API_TIMEOUT", "GITHUB_TIMEOUT", "DOCKERHUB_TIMEOUT", "PYPI_TIMEOUT",
+                "GROK_TIMEOUT", "TERRAFORM_TIMEOUT")
+
+
+def run_check(timeout: int, slack: float) -> list:
+    """Probe the stalled mock; returns (name, ok, seconds, error_class) per failed check."""
+    process, base_url = start_mock(stall_rate=1.0)
+    cache_dir = tempfile.mkdtemp(prefix="probe_deadlines_")
+    try:
+        os.environ.update(BENCH_CREDENTIALS)
+        os.environ.update({
+            "API_PROBE_REDIRECT": base_url,
+            "API_PROBE_CACHE_PATH": os.path.join(cache_dir, "cache.json"),
+            # Far beyond the per-probe timeouts: the probes must stop on their own
+            "API_CHECK_BUDGET": str(timeout * 5),
+        })
+        for name in ("OPENAI_BASE_URL", "ANTHROPIC_BASE_URL"):
+            os.environ.pop(name, None)
+        for name in TIMEOUT_VARS:
+            os.environ[name] = str(timeout)
+
+        import api_utils
+
+        started = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = api_utils._run_sync(api_utils.probe_all(refresh=True))
+        elapsed = time.monotonic() - started
+
+        failures = []
+        for name, result in results.items():
+            seconds = result.timings.get("total", float("inf"))
+            within = seconds <= timeout + slack and result.error_class == "timeout"
+            mark = "✅" if within and not result.ok else "❌"
+            print(f"{mark} {name:<16} {seconds:6.2f}s  {result.error_class}")
+            if result.ok or not within:
+                failures.append((name, result.ok, seconds, result.error_class))
+        print(f"⏱️ All probes returned in {elapsed:.2f}s (per-probe timeout {timeout}s + {slack}s slack)")
+        if elapsed > timeout + slack:
+            failures.append(("probe_all", False, elapsed, None))
+        return failures
+    finally:
+        process.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check probe deadlines against a server that never answers.")
+    parser.add_argument("--timeout", type=int, default=2, help="per-probe timeout in seconds")
+    parser.add_argument("--slack", type=float, default=0.5, help="seconds allowed past the timeout")
+    args = parser.parse_args()
+
+    failures = run_check(args.timeout, args.slack)
+    if failures:
+        print(f"❌ {len(failures)} probe(s) did not fail within their deadline")
+        sys.exit(1)
+    print("✅ Every probe gave up within its deadline")
+
+
+if __name__ == '__main__':
+    main()
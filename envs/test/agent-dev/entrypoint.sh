@@ -82,6 +82,7 @@ echo "   langgraph new my-project                              # Create new Lang
 echo "   langgraph dev                                         # Start development server"
 echo "   ./envs/test/agent-dev/service_health_check.sh status  # Check service status"
 echo "   ./envs/test/agent-dev/integration_test.sh             # Run integration tests"
+echo "   python3 envs/setup/probe_monitor.py --quiet &         # Provider health monitor (:8765/health)"
 echo ""
 
 echo "🔧 Internal Service URLs (from container):"
@@ -2,34 +2,152 @@
 Simple LangGraph agent example
 """
 
+import asyncio
+import concurrent.futures
+import os
+import sys
 from typing import Annotated, Literal, TypedDict
-from langchain_core.messages import HumanMessage
+from langchain_core.language_models.chat_models import BaseChatModel, agenerate_from_stream
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGenerationChunk
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 
+# Shared setup modules (api_utils, chat_stream, checkpoint_retention,
+# checkpoint_serde, checkpointer, client_pool, latency_window, message_window,
+# probe_monitor, provider_router, rate_limit, sec_utils, secret_watcher,
+# semantic_cache) are mounted into /opt by docker-compose
+sys.path.append(os.environ.get("AGENT_SETUP_PATH", "/opt"))
+try:
+    from chat_stream import FAKE_PROVIDER, chat_messages, stream_chat, stream_providers
+    from checkpoint_retention import start_retention
+    from checkpointer import saver_from_url
+    from message_window import window_messages
+    from provider_router import get_router
+    from secret_watcher import start_watcher
+    from semantic_cache import context_key, get_cache
+except ImportError:  # pragma: no cover - running outside the container
+    stream_chat = None
+    window_messages = add_messages
+
+# Rotated keys apply without a restart: pooled clients switch on their next call.
+# Opt-in, so importing the graph (tests, batch_runner) starts no thread; the
+# server's compose service sets SECRETS_WATCH=true and mounts the secrets file
+if stream_chat is not None and os.environ.get("SECRETS_WATCH", "false").lower() == "true":
+    start_watcher()
+
+# AGENT_LLM_PROVIDER value that lets the router pick among every provider with a key
+AUTO_PROVIDER = "auto"
+
 
 class State(TypedDict):
-    # Messages have the type "list[BaseMessage]"
-    messages: Annotated[list, add_messages]
+    # Messages have the type "list[BaseMessage]"; older turns are folded into a
+    # summary past MESSAGE_WINDOW_TOKENS (see message_window)
+    messages: Annotated[list, window_messages]
+    # Providers for the next reply, best first (set by the router node)
+    providers: list
+
+
+class ProviderChatModel(BaseChatModel):
+    """
+    Chat model streaming from the best of its providers through provider_router.
+
+    Being a LangChain chat model, its tokens reach clients of the server's
+    "messages" stream mode (and astream_events) as they are generated.
+    """
+
+    providers: list = ["fake"]
+    hedge: bool = False
 
+    @property
+    def _llm_type(self) -> str:
+        return f"provider-{'+'.join(self.providers)}"
 
-def chatbot(state: State):
-    return {"messages": [f"Hello! You said: {state['messages'][-1].content}"]}
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        async for text in get_router().stream(chat_messages(messages), self.providers, self.hedge):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
 
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return await agenerate_from_stream(self._astream(messages, stop, run_manager, **kwargs))
 
-def route_message(state: State) -> Literal["chatbot", END]:
-    """Route to chatbot or end."""
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        # The pooled clients are async; sync callers get their own event loop,
+        # on a worker thread if this thread already runs one (a sync tool or
+        # callback under ainvoke), where asyncio.run() would raise
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._agenerate(messages, stop, **kwargs))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self._agenerate(messages, stop, **kwargs)).result()
+
+
+def router(state: State):
+    """Pick the providers for the reply: AGENT_LLM_PROVIDER, or the router's ranking for "auto"."""
+    if stream_chat is None:
+        return {"providers": []}
+    provider = os.environ.get("AGENT_LLM_PROVIDER") or FAKE_PROVIDER
+    if provider == AUTO_PROVIDER:
+        return {"providers": get_router().rank()}
+    if provider not in stream_providers():
+        choices = ", ".join([*stream_providers(), AUTO_PROVIDER])
+        raise ValueError(f"unknown AGENT_LLM_PROVIDER '{provider}'; choose from {choices}")
+    return {"providers": [provider]}
+
+
+async def chatbot(state: State):
+    if stream_chat is None:
+        return {"messages": [f"Hello! You said: {state['messages'][-1].content}"]}
+    # SEMANTIC_CACHE=true answers questions like ones answered before in the
+    # same conversation context without calling a model
+    cache = get_cache() if os.environ.get("SEMANTIC_CACHE", "false").lower() == "true" else None
+    if cache is not None:
+        namespace = os.environ.get("SEMANTIC_CACHE_NAMESPACE", "agent")
+        question = state["messages"][-1].content
+        context = context_key(chat_messages(state["messages"][:-1]))
+        answer, vector = await cache.lookup(namespace, question, context)
+        if answer is not None:
+            return {"messages": [AIMessage(content=answer)]}
+    # AGENT_HEDGE=true also asks the next best provider when the best one is slow
+    model = ProviderChatModel(
+        providers=state["providers"],
+        hedge=os.environ.get("AGENT_HEDGE", "false").lower() == "true",
+    )
+    reply = await model.ainvoke(state["messages"])
+    if cache is not None:
+        await cache.store(namespace, question, reply.content, context, vector=vector)
+    return {"messages": [reply]}
+
+
+def route_message(state: State) -> Literal["router", END]:
+    """Route to another reply while a human turn is unanswered, else end the run."""
     messages = state.get("messages", [])
-    if messages and messages[-1].content.lower() == "quit":
-        return END
-    return "chatbot"
+    # The chatbot's reply is normally last, so a run ends after one reply; the
+    # next turn arrives as a new run on the same thread
+    if messages and isinstance(messages[-1], HumanMessage) and messages[-1].content.lower() != "quit":
+        return "router"
+    return END
 
 
 # Build the graph
 graph_builder = StateGraph(State)
+graph_builder.add_node("router", router)
 graph_builder.add_node("chatbot", chatbot)
-graph_builder.add_edge(START, "chatbot")
+graph_builder.add_edge(START, "router")
+graph_builder.add_edge("router", "chatbot")
 graph_builder.add_conditional_edges("chatbot", route_message)
 
-# Compile the graph
-graph = graph_builder.compile()
+# Compile the graph; AGENT_CHECKPOINT_URL (postgresql:// or sqlite://) persists
+# its state when it runs outside the LangGraph server, which brings its own
+checkpoint_url = os.environ.get("AGENT_CHECKPOINT_URL")
+# Rows are tagged with the graph's name in langgraph.json
+checkpointer = saver_from_url(checkpoint_url, graph_id="agent") if checkpoint_url and stream_chat is not None else None
+graph = graph_builder.compile(checkpointer=checkpointer)
+
+# CHECKPOINT_RETENTION=true thins old checkpoints and expires idle threads
+# in the background (see checkpoint_retention)
+if checkpointer is not None and os.environ.get("CHECKPOINT_RETENTION", "false").lower() == "true":
+    start_retention(checkpointer)
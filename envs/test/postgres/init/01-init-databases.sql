@@ -15,23 +15,54 @@
 -- CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 -- CREATE EXTENSION IF NOT EXISTS "pg_trgm";
 
--- -- Create a table for LangGraph checkpoints in default database
--- \c postgres;
--- CREATE TABLE IF NOT EXISTS checkpoints (
---     checkpoint_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
---     graph_id VARCHAR(255) NOT NULL,
---     thread_id VARCHAR(255) NOT NULL,
---     checkpoint_data JSONB NOT NULL,
---     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
---     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
--- );
+-- Tables for LangGraph checkpoints in default database
+-- (envs/setup/checkpointer.py; keep the two in sync)
+-- A checkpoint row per step, a blob per changed channel value, and the
+-- pending writes of each task, so a step writes only what changed
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    graph_id TEXT,
+    type TEXT,
+    checkpoint BYTEA NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BYTEA NOT NULL,
+    created_at DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+
+CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BYTEA,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+
+CREATE TABLE IF NOT EXISTS checkpoint_writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    blob BYTEA,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
 
--- -- Create index for faster lookups
--- CREATE INDEX IF NOT EXISTS idx_checkpoints_graph_thread 
--- ON checkpoints(graph_id, thread_id);
+-- Latest checkpoint of a thread is a backward scan of the primary key;
+-- this index serves the latest checkpoint of each thread of a graph
+CREATE INDEX IF NOT EXISTS idx_checkpoints_graph_thread
+ON checkpoints (graph_id, thread_id, checkpoint_id DESC);
 
--- CREATE INDEX IF NOT EXISTS idx_checkpoints_created_at 
--- ON checkpoints(created_at);
+CREATE INDEX IF NOT EXISTS idx_checkpoints_created_at
+ON checkpoints (created_at);
 
 -- -- Create a simple logging table
 -- CREATE TABLE IF NOT EXISTS agent_logs (